@@ -1,15 +1,7 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timedelta
-import os
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-import io
+from datetime import datetime
+import threading
 
 # Flask uygulaması oluştur
 app = Flask(__name__, template_folder='../templates', static_folder='../static')
@@ -40,9 +32,19 @@ class Urun(db.Model):
     def __repr__(self):
         return f'<Urun {self.ad}>'
 
-# Veritabanını oluştur
-with app.app_context():
-    db.create_all()
+# Veritabanını ilk istekte bir kez oluştur (import sırasında değil: her soğuk başlangıcı yavaşlatır)
+_tablolar_hazir = False
+_tablo_kilidi = threading.Lock()
+
+@app.before_request
+def tablolari_hazirla():
+    global _tablolar_hazir
+    if _tablolar_hazir:
+        return
+    with _tablo_kilidi:
+        if not _tablolar_hazir:
+            db.create_all()
+            _tablolar_hazir = True
 
 # Ana sayfa
 @app.route('/')
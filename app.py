@@ -1,57 +1,224 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, session
+# Import-time measurement for the startup metrics (see create_app)
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, Blueprint, current_app, g, has_app_context, has_request_context, make_response, render_template, request, redirect, url_for, flash, jsonify, send_file, session, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
-from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
+from flask_sqlalchemy.session import Session as FlaskSQLAlchemySession
+from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user, login_url
 from flask_bcrypt import Bcrypt
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.util import find_tables
+from sqlalchemy.schema import CreateIndex
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import ServiceUnavailable
 from flask_wtf import FlaskForm
+from flask_wtf.csrf import generate_csrf, validate_csrf
+from wtforms import ValidationError
 from wtforms import StringField, PasswordField, IntegerField, FloatField, TextAreaField, SelectField, SubmitField
 from wtforms.validators import DataRequired, Email, Length, EqualTo, NumberRange
 from datetime import datetime, timedelta
 import os
-import jwt
+import click
 from dotenv import load_dotenv
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
+# openpyxl, ReportLab and PyJWT are imported inside the functions that use them:
+# they dominate import time and most processes never export a document
 import io
+import functools
+import base64
+import binascii
+import re
+import csv
+import itertools
+import random
+import atexit
+import queue
+import threading
+import hashlib
+import hmac
+import json
+import tempfile
+import contextlib
+from collections import OrderedDict
+from statistics import NormalDist
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 # Load environment variables
 load_dotenv()
 
-# Flask App Configuration
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'celiker-enterprise-secret-key-2024')
-app.config['WTF_CSRF_ENABLED'] = True
-
-# Database Configuration
-database_url = os.environ.get('DATABASE_URL')
-if database_url:
-    # Production PostgreSQL (Render.com)
-    if database_url.startswith('postgres://'):
-        database_url = database_url.replace('postgres://', 'postgresql://', 1)
-    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
-else:
-    # Local development - SQLite
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///celiker_enterprise.db'
-
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_pre_ping': True,
-    'pool_recycle': 300,
-}
+class RoutingSession(FlaskSQLAlchemySession):
+    """Sends a request's reads to its replica bind (chosen by replica_reads).
+
+    Flushes and INSERT/UPDATE/DELETE statements always use the primary, and
+    once the request has written, its later reads do too (read-your-writes).
+    """
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            writing = self._flushing or isinstance(clause, UpdateBase)
+            if writing:
+                g.db_wrote = True
+            # Tenants moved to their own database read and write there, replicas or not
+            tenant_bind = tenant_router.bind_for(mapper, clause, writing)
+            if tenant_bind is not None:
+                return self._db.engines[tenant_bind]
+            if not writing and g.get('db_replica') and not g.get('db_wrote'):
+                return self._db.engines[g.db_replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
 
-# Initialize Extensions
-db = SQLAlchemy(app)
-bcrypt = Bcrypt(app)
+# Initialize Extensions (bound to an application in create_app)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+bcrypt = Bcrypt()
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'main.login'
 login_manager.login_message = 'Bu sayfaya erişmek için giriş yapmalısınız.'
 login_manager.login_message_category = 'info'
 
+main = Blueprint('main', __name__, cli_group=None)
+
+def _build_id():
+    """Deployed code version: the git commit from .git, else app.py's modification time"""
+    kok = os.path.dirname(os.path.abspath(__file__))
+    try:
+        with open(os.path.join(kok, '.git', 'HEAD')) as f:
+            head = f.read().strip()
+        if not head.startswith('ref: '):
+            return head
+        ref = head[5:]
+        try:
+            with open(os.path.join(kok, '.git', ref)) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            with open(os.path.join(kok, '.git', 'packed-refs')) as f:
+                for line in f:
+                    if line.rstrip().endswith(' ' + ref):
+                        return line.split()[0]
+    except OSError:
+        pass
+    return str(int(os.path.getmtime(os.path.abspath(__file__))))
+
+# Flask App Configuration
+def configure_app(app):
+    """Load configuration from the environment"""
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'celiker-enterprise-secret-key-2024')
+    app.config['WTF_CSRF_ENABLED'] = True
+    # Part of every page ETag, so a deploy invalidates pages cached by browsers
+    app.config['BUILD_ID'] = os.environ.get('BUILD_ID') or os.environ.get('RENDER_GIT_COMMIT') or _build_id()
+
+    # Database Configuration
+    database_url = os.environ.get('DATABASE_URL')
+    if database_url:
+        # Production PostgreSQL (Render.com)
+        if database_url.startswith('postgres://'):
+            database_url = database_url.replace('postgres://', 'postgresql://', 1)
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    else:
+        # Local development - SQLite
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///celiker_enterprise.db'
+
+    # Read replicas (optional, comma separated): read-only views query them,
+    # sessions that wrote in the last DB_REPLICA_STICKY_SECONDS stay on the primary
+    replica_urls = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    app.config['SQLALCHEMY_BINDS'] = {
+        f'replica_{i}': url.replace('postgres://', 'postgresql://', 1) for i, url in enumerate(replica_urls)
+    }
+    app.config['DB_REPLICA_STICKY_SECONDS'] = float(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+
+    # Per-tenant databases (optional, comma separated name=url): users moved there with
+    # `flask move-tenant` keep all their rows in that store. Tenants sharing a store share its
+    # pool; the tenant map is cached per worker for TENANT_MAP_CACHE_TTL seconds.
+    app.config['TENANT_DATABASES'] = dict(
+        (name.strip(), url.strip()) for name, url in
+        (item.split('=', 1) for item in os.environ.get('TENANT_DATABASES', '').split(',') if '=' in item)
+    )
+    app.config['TENANT_POOL_SIZE'] = int(os.environ.get('TENANT_POOL_SIZE', 2))
+    app.config['TENANT_POOL_MAX_OVERFLOW'] = int(os.environ.get('TENANT_POOL_MAX_OVERFLOW', 3))
+    app.config['TENANT_MAP_CACHE_TTL'] = float(os.environ.get('TENANT_MAP_CACHE_TTL', 10))
+
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_pre_ping': True,
+        'pool_recycle': 300,
+    }
+
+    # Dashboard statistics: read from the per-category stats table instead of
+    # aggregating products on every page load (run `flask rebuild-stats` after enabling)
+    app.config['STATS_TABLE_ENABLED'] = os.environ.get('STATS_TABLE_ENABLED', 'false').lower() == 'true'
+    
+    # Columnar per-user inventory snapshots (NumPy) for /api/envanter_analizi; when enabled
+    # the dashboard totals come from the snapshot too. Roughly 40 bytes per product each.
+    app.config['INVENTORY_SNAPSHOT_ENABLED'] = os.environ.get('INVENTORY_SNAPSHOT_ENABLED', 'false').lower() == 'true'
+    app.config['INVENTORY_SNAPSHOT_CACHE_SIZE'] = int(os.environ.get('INVENTORY_SNAPSHOT_CACHE_SIZE', 8))
+    
+    # Reorder/ABC analysis: consumption window over the stock ledger and users kept in memory
+    app.config['STOCK_ANALYSIS_WINDOW_DAYS'] = int(os.environ.get('STOCK_ANALYSIS_WINDOW_DAYS', 90))
+    app.config['STOCK_ANALYSIS_CACHE_SIZE'] = int(os.environ.get('STOCK_ANALYSIS_CACHE_SIZE', 8))
+
+    # Audit log: buffered write-behind inserts (disable for synchronous commits)
+    app.config['AUDIT_BUFFER_ENABLED'] = os.environ.get('AUDIT_BUFFER_ENABLED', 'true').lower() == 'true'
+    app.config['AUDIT_BUFFER_MAX_SIZE'] = int(os.environ.get('AUDIT_BUFFER_MAX_SIZE', 10000))
+    app.config['AUDIT_FLUSH_BATCH_SIZE'] = int(os.environ.get('AUDIT_FLUSH_BATCH_SIZE', 500))
+    app.config['AUDIT_FLUSH_INTERVAL'] = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 2.0))
+    
+    # Audit retention: `flask archive-activities` moves older activities into gzip files per
+    # month under AUDIT_ARCHIVE_DIR; /api/aktiviteler reads both. No default: archived rows are
+    # deleted from the database, so the directory must be persistent storage chosen on purpose
+    app.config['AUDIT_RETENTION_DAYS'] = int(os.environ.get('AUDIT_RETENTION_DAYS', 90))
+    app.config['AUDIT_ARCHIVE_DIR'] = os.environ.get('AUDIT_ARCHIVE_DIR')
+
+    # Barcode lookup cache (per worker process; TTL bounds staleness across workers)
+    app.config['BARCODE_CACHE_SIZE'] = int(os.environ.get('BARCODE_CACHE_SIZE', 10000))
+    app.config['BARCODE_CACHE_TTL'] = float(os.environ.get('BARCODE_CACHE_TTL', 60))
+
+    # Bulk import: rows per upsert transaction
+    app.config['IMPORT_CHUNK_SIZE'] = int(os.environ.get('IMPORT_CHUNK_SIZE', 1000))
+
+    # API tokens (Authorization: Bearer <jwt> on /api/ routes)
+    app.config['JWT_TOKEN_HOURS'] = int(os.environ.get('JWT_TOKEN_HOURS', 24))
+    app.config['API_USER_CACHE_TTL'] = float(os.environ.get('API_USER_CACHE_TTL', 30))
+
+    # PDF reports: background workers per process and on-disk cache of finished reports
+    app.config['PDF_REPORT_WORKERS'] = int(os.environ.get('PDF_REPORT_WORKERS', 2))
+    app.config['PDF_REPORT_TIMEOUT'] = int(os.environ.get('PDF_REPORT_TIMEOUT', 600))  # seconds before an unfinished job may be restarted
+    app.config['REPORT_CACHE_DIR'] = os.environ.get('REPORT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'stok_raporlari'))
+    app.config['PDF_ROWS_PER_TABLE'] = int(os.environ.get('PDF_ROWS_PER_TABLE', 500))
+    app.config['PDF_FONT_PATH'] = os.environ.get('PDF_FONT_PATH', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+    
+    # Excel export: rows fetched per batch while streaming
+    app.config['EXPORT_BATCH_SIZE'] = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+    
+    # Metrics: /metrics is readable by admins or with Authorization: Bearer <METRICS_TOKEN>
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 500))
+    
+    # Schema check: missing tables are created on the first request, once per process.
+    # For server databases a marker file per (URL, table layout) skips it on later cold starts
+    app.config['SCHEMA_MARKER_DIR'] = os.environ.get('SCHEMA_MARKER_DIR', tempfile.gettempdir())
+    
+    # Stock alert feed: events younger than this are held back so none is skipped
+    app.config['STOCK_ALERT_FEED_DELAY'] = float(os.environ.get('STOCK_ALERT_FEED_DELAY', 2))
+    
+    # Live updates (SSE): in-process pub/sub unless a shared broker URL (redis://...) is set.
+    # Every open stream holds a server thread, so by default streams may use half of them.
+    app.config['LIVE_UPDATES_URL'] = os.environ.get('LIVE_UPDATES_URL', '')
+    app.config['LIVE_UPDATES_MAX_STREAMS'] = int(os.environ.get(
+        'LIVE_UPDATES_MAX_STREAMS', max(1, int(os.environ.get('GUNICORN_THREADS', 4)) // 2)))
+    app.config['LIVE_UPDATES_STREAM_SECONDS'] = int(os.environ.get('LIVE_UPDATES_STREAM_SECONDS', 300))
+    app.config['LIVE_UPDATES_HEARTBEAT_SECONDS'] = int(os.environ.get('LIVE_UPDATES_HEARTBEAT_SECONDS', 15))
+    app.config['LIVE_UPDATES_QUEUE_SIZE'] = 100
+    
+    # Product list: seconds a per-user product count may be served from cache
+    app.config['PRODUCT_COUNT_CACHE_TTL'] = float(os.environ.get('PRODUCT_COUNT_CACHE_TTL', 60))
+    
+    # Password hashing: bcrypt cost (read by Flask-Bcrypt) and the per-process hashing pool.
+    # Beyond workers + queue size, logins are refused with 503 instead of pinning request threads.
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 1))
+    app.config['PASSWORD_HASH_QUEUE_SIZE'] = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 8))
+    app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5))
+
 # Enterprise Database Models
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -73,25 +240,40 @@ class User(UserMixin, db.Model):
     activities = db.relationship('UserActivity', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        """Verify on the hashing pool; a correct password also brings the hash to the current cost (caller commits)"""
+        if not password_hasher.verify(self.password_hash, password):
+            return False
+        if password_hasher.needs_rehash(self.password_hash):
+            self.set_password(password)
+        return True
     
     def get_full_name(self):
         return f"{self.first_name} {self.last_name}"
     
     def generate_jwt_token(self):
+        import jwt
+        # Identity only: role and active flag are read from the users row (see load_user_from_token)
         payload = {
-            'user_id': self.id,
-            'username': self.username,
-            'exp': datetime.utcnow() + timedelta(hours=24)
+            'sub': str(self.id),
+            'exp': datetime.utcnow() + timedelta(hours=current_app.config['JWT_TOKEN_HOURS'])
         }
-        return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
+        return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
     
     def __repr__(self):
         return f'<User {self.username}>'
 
+def stok_durumu_hesapla(stok_adedi, min_stok_seviyesi, max_stok_seviyesi):
+    if stok_adedi == 0:
+        return 'kritik'
+    elif stok_adedi <= min_stok_seviyesi:
+        return 'dusuk'
+    elif stok_adedi >= max_stok_seviyesi:
+        return 'fazla'
+    return 'normal'
+
 class Urun(db.Model):
     __tablename__ = 'products'
     
@@ -108,132 +290,2728 @@ class Urun(db.Model):
     # User relationship
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     
+    # Search document
+    arama = db.relationship('UrunArama', uselist=False, lazy=True, cascade='all, delete-orphan')
+    
     # Timestamps
     olusturma_tarihi = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     guncelleme_tarihi = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Unique constraint per user
-    __table_args__ = (db.UniqueConstraint('barkod', 'user_id', name='unique_barcode_per_user'),)
+    __table_args__ = (
+        db.UniqueConstraint('barkod', 'user_id', name='unique_barcode_per_user'),
+        db.Index('ix_products_user_olusturma', 'user_id', 'olusturma_tarihi'),
+        db.Index('ix_products_user_guncelleme', 'user_id', 'guncelleme_tarihi', 'id'),
+    )
+    
+    @property
+    def toplam_deger(self):
+        return self.stok_adedi * self.birim_fiyat
+    
+    @hybrid_property
+    def stok_durumu(self):
+        return stok_durumu_hesapla(self.stok_adedi, self.min_stok_seviyesi, self.max_stok_seviyesi)
+    
+    @stok_durumu.expression
+    def stok_durumu(cls):
+        return db.case(
+            (cls.stok_adedi == 0, 'kritik'),
+            (cls.stok_adedi <= cls.min_stok_seviyesi, 'dusuk'),
+            (cls.stok_adedi >= cls.max_stok_seviyesi, 'fazla'),
+            else_='normal'
+        )
+    
+    @hybrid_property
+    def stok_farki(self):
+        return self.stok_adedi - self.min_stok_seviyesi
+    
+    @classmethod
+    def stok_durumu_filtresi(cls, *durumlar):
+        """WHERE clause matching any of the given stock statuses.
+
+        'kritik' and 'dusuk' are written against (user_id, stok_adedi) and
+        (user_id, stok_adedi - min_stok_seviyesi) so they can use the indexes below.
+        """
+        kosullar = []
+        for durum in durumlar:
+            if durum == 'kritik':
+                kosullar.append(cls.stok_adedi == 0)
+            elif durum == 'dusuk':
+                kosullar.append(db.and_(cls.stok_adedi != 0, cls.stok_farki <= 0))
+            else:
+                kosullar.append(cls.stok_durumu == durum)
+        return db.or_(*kosullar)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'ad': self.ad,
+            'barkod': self.barkod,
+            'stok_adedi': self.stok_adedi,
+            'birim_fiyat': self.birim_fiyat,
+            'kategori': self.kategori,
+            'aciklama': self.aciklama,
+            'toplam_deger': self.toplam_deger,
+            'stok_durumu': self.stok_durumu,
+            'min_stok_seviyesi': self.min_stok_seviyesi,
+            'max_stok_seviyesi': self.max_stok_seviyesi,
+            'olusturma_tarihi': self.olusturma_tarihi.isoformat(),
+            'guncelleme_tarihi': self.guncelleme_tarihi.isoformat()
+        }
+    
+    def __repr__(self):
+        return f'<Urun {self.ad}>'
+
+# Stock status indexes (expression index serves the stok_adedi <= min_stok_seviyesi comparison)
+db.Index('ix_products_user_stok', Urun.user_id, Urun.stok_adedi)
+db.Index('ix_products_user_stok_farki', Urun.user_id, Urun.stok_adedi - Urun.min_stok_seviyesi)
+
+class UrunArama(db.Model):
+    """Normalized search document per product, indexed per dialect (FTS5 / tsvector + trigram)"""
+    __tablename__ = 'product_search'
+    
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    icerik = db.Column(db.Text, nullable=False, default='')
+    
+    def __repr__(self):
+        return f'<UrunArama {self.product_id}>'
+
+# SQLite: external-content FTS5 table kept in sync with product_search by triggers
+for _ddl in [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        icerik, user_id, content='product_search', content_rowid='product_id')""",
+    """CREATE TRIGGER IF NOT EXISTS product_search_ai AFTER INSERT ON product_search BEGIN
+        INSERT INTO products_fts(rowid, icerik, user_id) VALUES (new.product_id, new.icerik, new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_search_ad AFTER DELETE ON product_search BEGIN
+        INSERT INTO products_fts(products_fts, rowid, icerik, user_id) VALUES ('delete', old.product_id, old.icerik, old.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_search_au AFTER UPDATE ON product_search BEGIN
+        INSERT INTO products_fts(products_fts, rowid, icerik, user_id) VALUES ('delete', old.product_id, old.icerik, old.user_id);
+        INSERT INTO products_fts(rowid, icerik, user_id) VALUES (new.product_id, new.icerik, new.user_id);
+    END""",
+]:
+    db.event.listen(UrunArama.__table__, 'after_create', db.DDL(_ddl).execute_if(dialect='sqlite'))
+
+# PostgreSQL: GIN indexes for tsvector matching and trigram substring matching
+for _ddl in [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_product_search_tsv ON product_search USING gin (to_tsvector('simple', icerik))",
+    "CREATE INDEX IF NOT EXISTS ix_product_search_trgm ON product_search USING gin (icerik gin_trgm_ops)",
+]:
+    db.event.listen(UrunArama.__table__, 'after_create', db.DDL(_ddl).execute_if(dialect='postgresql'))
+
+class UserActivity(db.Model):
+    __tablename__ = 'user_activities'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    action = db.Column(db.String(50), nullable=False)  # create, update, delete, login, logout
+    resource_type = db.Column(db.String(50))  # product, user, etc.
+    resource_id = db.Column(db.Integer)
+    details = db.Column(db.JSON)
+    ip_address = db.Column(db.String(45))
+    user_agent = db.Column(db.Text)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    __table_args__ = (
+        db.Index('ix_user_activities_user_timestamp', 'user_id', 'timestamp'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'action': self.action,
+            'resource_type': self.resource_type,
+            'resource_id': self.resource_id,
+            'details': self.details,
+            'ip_address': self.ip_address,
+            'user_agent': self.user_agent,
+            'timestamp': self.timestamp.isoformat()
+        }
+    
+    def __repr__(self):
+        return f'<Activity {self.action} by {self.user_id}>'
+
+class UserAgent(db.Model):
+    """Distinct User-Agent strings; archived activities refer to them by id"""
+    __tablename__ = 'user_agents'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    ozet = db.Column(db.String(40), nullable=False, unique=True)  # sha1 of deger
+    deger = db.Column(db.Text, nullable=False)
+    
+    def __repr__(self):
+        return f'<UserAgent {self.id}>'
+
+class ActivityArchive(db.Model):
+    """Manifest of archive files: one gzip JSON-lines file per store, month and retention run"""
+    __tablename__ = 'activity_archives'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    magaza = db.Column(db.String(50))  # tenant store the rows came from; NULL = primary
+    ay = db.Column(db.String(7), nullable=False, index=True)  # YYYY-MM
+    dosya = db.Column(db.String(255), nullable=False)  # relative to AUDIT_ARCHIVE_DIR
+    satir_sayisi = db.Column(db.Integer, nullable=False)
+    ilk_zaman = db.Column(db.DateTime, nullable=False)
+    son_zaman = db.Column(db.DateTime, nullable=False)
+    kesim = db.Column(db.DateTime, nullable=False)  # the run archived rows older than this...
+    son_id = db.Column(db.Integer, nullable=False)  # ...with ids up to this
+    silindi = db.Column(db.Boolean, nullable=False, default=False)  # archived rows deleted from the live table
+    olusturma = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ActivityArchive {self.magaza or "ana"} {self.ay} {self.satir_sayisi}>'
+
+class StokHareketi(db.Model):
+    """Append-only stock ledger: one signed quantity per stock change"""
+    __tablename__ = 'stock_movements'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    product_id = db.Column(db.Integer, nullable=False)  # no FK: history outlives deleted products
+    barkod = db.Column(db.String(50), nullable=False)
+    miktar = db.Column(db.Integer, nullable=False)
+    neden = db.Column(db.String(30), nullable=False)  # ilk_stok, duzenleme, hareket, ice_aktarma, silme...
+    zaman = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_stock_movements_user_product_zaman', 'user_id', 'product_id', 'zaman'),
+        db.Index('ix_stock_movements_user_zaman', 'user_id', 'zaman'),
+        # Keyset reads of one user's ledger in id order (stock analysis)
+        db.Index('ix_stock_movements_user_id', 'user_id', 'id'),
+    )
+    
+    def __repr__(self):
+        return f'<StokHareketi {self.barkod} {self.miktar:+d}>'
+
+class StokSnapshot(db.Model):
+    """Periodic per-product stock level; point-in-time queries start from the nearest one"""
+    __tablename__ = 'stock_snapshots'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    product_id = db.Column(db.Integer, nullable=False)
+    barkod = db.Column(db.String(50), nullable=False)
+    stok_adedi = db.Column(db.Integer, nullable=False)
+    zaman = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_stock_snapshots_user_product_zaman', 'user_id', 'product_id', 'zaman'),
+    )
+    
+    def __repr__(self):
+        return f'<StokSnapshot {self.barkod} {self.stok_adedi}>'
+
+class StokUyarisi(db.Model):
+    """Low/critical stock alert for one product, raised and cleared as stock changes"""
+    __tablename__ = 'stock_alerts'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    product_id = db.Column(db.Integer, nullable=False)  # no FK: cleared alerts outlive deleted products
+    barkod = db.Column(db.String(50), nullable=False)
+    seviye = db.Column(db.String(10), nullable=False)  # dusuk, kritik
+    durum = db.Column(db.String(10), nullable=False, default='acik')  # acik, onaylandi, kapandi
+    stok_adedi = db.Column(db.Integer, nullable=False)
+    acilma_zamani = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    onay_zamani = db.Column(db.DateTime)
+    kapanma_zamani = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_stock_alerts_user_durum', 'user_id', 'durum'),
+        db.Index('ix_stock_alerts_user_product_durum', 'user_id', 'product_id', 'durum'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'barkod': self.barkod,
+            'seviye': self.seviye,
+            'durum': self.durum,
+            'stok_adedi': self.stok_adedi,
+            'acilma_zamani': self.acilma_zamani.isoformat(),
+            'onay_zamani': self.onay_zamani.isoformat() if self.onay_zamani else None,
+            'kapanma_zamani': self.kapanma_zamani.isoformat() if self.kapanma_zamani else None
+        }
+    
+    def __repr__(self):
+        return f'<StokUyarisi {self.barkod} {self.seviye} {self.durum}>'
+
+class StokUyariOlayi(db.Model):
+    """Append-only alert transitions; the id is the cursor for the polling feed"""
+    __tablename__ = 'stock_alert_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    uyari_id = db.Column(db.Integer, nullable=False)
+    product_id = db.Column(db.Integer, nullable=False)
+    barkod = db.Column(db.String(50), nullable=False)
+    olay = db.Column(db.String(20), nullable=False)  # acildi, seviye_degisti, onaylandi, kapandi
+    seviye = db.Column(db.String(10), nullable=False)
+    stok_adedi = db.Column(db.Integer, nullable=False)
+    zaman = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_stock_alert_events_user_id', 'user_id', 'id'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'uyari_id': self.uyari_id,
+            'product_id': self.product_id,
+            'barkod': self.barkod,
+            'olay': self.olay,
+            'seviye': self.seviye,
+            'stok_adedi': self.stok_adedi,
+            'zaman': self.zaman.isoformat()
+        }
+
+class CategoryStat(db.Model):
+    """Per-user, per-category running totals maintained on product writes"""
+    __tablename__ = 'category_stats'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    kategori = db.Column(db.String(50))
+    urun_sayisi = db.Column(db.Integer, nullable=False, default=0)
+    toplam_deger = db.Column(db.Float, nullable=False, default=0.0)
+    dusuk_stok_sayisi = db.Column(db.Integer, nullable=False, default=0)
+    kritik_stok_sayisi = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (db.UniqueConstraint('user_id', 'kategori', name='unique_category_per_user'),)
+    
+    def __repr__(self):
+        return f'<CategoryStat {self.kategori} for {self.user_id}>'
+
+class UserDataVersion(db.Model):
+    """Per-user counter bumped by every product and stock write (ETags, report cache keys)"""
+    __tablename__ = 'user_data_versions'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    surum = db.Column(db.Integer, nullable=False, default=0)
+    guncelleme = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UserDataVersion {self.user_id} v{self.surum}>'
+
+class TenantPlacement(db.Model):
+    """Tenant map: the store holding a user's rows (users without a row stay on the primary)"""
+    __tablename__ = 'tenant_placements'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    magaza = db.Column(db.String(50))  # TENANT_DATABASES name; NULL = primary
+    durum = db.Column(db.String(10), nullable=False, default='aktif')  # aktif, tasiniyor
+    guncelleme = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<TenantPlacement {self.user_id} {self.magaza or "ana"} {self.durum}>'
+
+# Flask-Login user loader
+@login_manager.user_loader
+def load_user(user_id):
+    return User.query.get(int(user_id))
+
+# Enterprise Forms
+class LoginForm(FlaskForm):
+    username = StringField('Kullanıcı Adı', validators=[DataRequired(), Length(min=3, max=80)])
+    password = PasswordField('Şifre', validators=[DataRequired()])
+    submit = SubmitField('Giriş Yap')
+
+class RegisterForm(FlaskForm):
+    username = StringField('Kullanıcı Adı', validators=[DataRequired(), Length(min=3, max=80)])
+    email = StringField('E-posta', validators=[DataRequired(), Email()])
+    first_name = StringField('Ad', validators=[DataRequired(), Length(min=2, max=50)])
+    last_name = StringField('Soyad', validators=[DataRequired(), Length(min=2, max=50)])
+    company = StringField('Şirket', validators=[Length(max=100)])
+    password = PasswordField('Şifre', validators=[DataRequired(), Length(min=6)])
+    password2 = PasswordField('Şifre Tekrar', validators=[DataRequired(), EqualTo('password')])
+    submit = SubmitField('Kayıt Ol')
+
+class ProductForm(FlaskForm):
+    ad = StringField('Ürün Adı', validators=[DataRequired(), Length(min=2, max=100)])
+    barkod = StringField('Barkod', validators=[DataRequired(), Length(min=1, max=50)])
+    stok_adedi = IntegerField('Stok Adedi', validators=[DataRequired(), NumberRange(min=0)])
+    birim_fiyat = FloatField('Birim Fiyat (₺)', validators=[DataRequired(), NumberRange(min=0)])
+    kategori = SelectField('Kategori', choices=[
+        ('Genel', 'Genel'),
+        ('Elektronik', 'Elektronik'),
+        ('Gıda', 'Gıda'),
+        ('Giyim', 'Giyim'),
+        ('Ev & Yaşam', 'Ev & Yaşam'),
+        ('Spor', 'Spor'),
+        ('Kitap', 'Kitap'),
+        ('Oyuncak', 'Oyuncak'),
+        ('Diğer', 'Diğer')
+    ], default='Genel')
+    min_stok_seviyesi = IntegerField('Minimum Stok Seviyesi', validators=[NumberRange(min=0)], default=10)
+    max_stok_seviyesi = IntegerField('Maksimum Stok Seviyesi', validators=[NumberRange(min=1)], default=1000)
+    aciklama = TextAreaField('Açıklama', validators=[Length(max=500)])
+    submit = SubmitField('Kaydet')
+
+# Utility Functions
+class AuditBuffer:
+    """Write-behind buffer for UserActivity rows.
+
+    Requests enqueue plain dicts; a background thread bulk-inserts them when
+    a batch fills up or the flush interval passes, and on interpreter exit.
+    """
+    
+    def __init__(self, app=None):
+        self.app = None
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        atexit.register(self.flush)
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config['AUDIT_FLUSH_BATCH_SIZE']
+        self.interval = app.config['AUDIT_FLUSH_INTERVAL']
+        self.records = queue.Queue(maxsize=app.config['AUDIT_BUFFER_MAX_SIZE'])
+        app.extensions['audit_buffer'] = self
+    
+    def _ensure_started(self):
+        # Started lazily (and again after fork) so preloading servers don't share the thread
+        if self.thread is not None and self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self._run, name='audit-flusher', daemon=True)
+                self.thread.start()
+    
+    def enqueue(self, record):
+        self._ensure_started()
+        try:
+            self.records.put_nowait(record)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            self.app.logger.warning('Audit buffer full, activity dropped: %s', record.get('action'))
+            return
+        if self.records.qsize() >= self.batch_size:
+            self.wakeup.set()
+    
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            self.flush()
+    
+    def flush(self):
+        """Bulk-insert everything currently queued, one batch per transaction"""
+        if self.app is None:
+            return
+        with self.flush_lock:
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.records.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return
+                
+                try:
+                    with self.app.app_context():
+                        for magaza, rows in tenant_router.group_by_store(batch).items():
+                            with tenant_router.scope(magaza=magaza):
+                                db.session.execute(db.insert(UserActivity), rows)
+                                db.session.commit()
+                    with self.lock:
+                        self.flushed += len(batch)
+                except Exception:
+                    with self.lock:
+                        self.failed += len(batch)
+                    self.app.logger.exception('Audit batch of %d records could not be written', len(batch))
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'queued': self.records.qsize(),
+                'flushed': self.flushed,
+                'dropped': self.dropped,
+                'failed': self.failed
+            }
+
+audit_buffer = AuditBuffer()
+
+class RequestMetrics:
+    """Per-endpoint request and SQL timings, pool checkout waits and slow queries.
+
+    Kept in process memory and rendered in Prometheus text format; with
+    several gunicorn workers each scrape reports the worker that served it.
+    """
+    
+    DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    SQL_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+    POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+    
+    HELP = {
+        'http_request_duration_seconds': ('histogram', 'Request duration by endpoint'),
+        'http_requests_total': ('counter', 'Requests by endpoint and status'),
+        'http_request_sql_statements': ('histogram', 'SQL statements executed per request'),
+        'http_request_sql_duration_seconds': ('histogram', 'Time spent in SQL per request'),
+        'db_pool_checkout_wait_seconds': ('histogram', 'Time waiting for a pooled connection'),
+        'db_statements_total': ('counter', 'SQL statements executed'),
+        'db_slow_queries_total': ('counter', 'SQL statements slower than SLOW_QUERY_THRESHOLD_MS'),
+        'app_startup_seconds': ('gauge', 'Process startup time by phase'),
+        'live_update_streams': ('gauge', 'Open live update (SSE) streams'),
+        'password_hash_seconds': ('histogram', 'bcrypt hashing and verification time'),
+        'password_hash_queue_wait_seconds': ('histogram', 'Time a password hash waited for the hashing pool'),
+        'password_hash_rejected_total': ('counter', 'Password hashes refused because the pool was busy'),
+    }
+    
+    def __init__(self):
+        self.app = None
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.first_request_done = False
+    
+    def init_app(self, app):
+        self.app = app
+        self.slow_query_seconds = app.config['SLOW_QUERY_THRESHOLD_MS'] / 1000
+        app.extensions['request_metrics'] = self
+        if not app.config['METRICS_ENABLED']:
+            return
+        
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        with app.app_context():
+            for engine in db.engines.values():
+                self.instrument_engine(engine)
+    
+    def instrument_engine(self, engine):
+        db.event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        db.event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        
+        # The pool has no "before checkout" event, so time the engine's pool access;
+        # wrapping the engine (not the pool) survives dispose() after fork
+        raw_connection = engine.raw_connection
+        
+        def timed_raw_connection():
+            started = time.perf_counter()
+            try:
+                return raw_connection()
+            finally:
+                self.observe('db_pool_checkout_wait_seconds', (), time.perf_counter() - started,
+                             self.POOL_WAIT_BUCKETS)
+        engine.raw_connection = timed_raw_connection
+    
+    def observe(self, name, labels, value, buckets):
+        with self.lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[(name, labels)] = [buckets, [0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[1][i] += 1
+                    break
+            histogram[2] += value
+            histogram[3] += 1
+    
+    def increment(self, name, labels=(), amount=1):
+        with self.lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + amount
+    
+    def set_gauge(self, name, labels, value):
+        with self.lock:
+            self.gauges[(name, labels)] = value
+    
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.sql_statements = 0
+        g.sql_seconds = 0.0
+    
+    def _after_request(self, response):
+        g.metrics_status = response.status_code
+        return response
+    
+    def _teardown_request(self, exc):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        # Unmatched URLs share one label so 404 scans can't blow up cardinality
+        endpoint = request.endpoint or 'unmatched'
+        status = g.pop('metrics_status', 500)
+        elapsed = time.perf_counter() - started
+        if not self.first_request_done:
+            self.first_request_done = True
+            self.set_gauge('app_startup_seconds', (('phase', 'first_request'),), elapsed)
+        self.observe('http_request_duration_seconds', (('endpoint', endpoint), ('method', request.method)),
+                     elapsed, self.DURATION_BUCKETS)
+        self.increment('http_requests_total',
+                       (('endpoint', endpoint), ('method', request.method), ('status', str(status))))
+        self.observe('http_request_sql_statements', (('endpoint', endpoint),),
+                     g.pop('sql_statements', 0), self.SQL_COUNT_BUCKETS)
+        self.observe('http_request_sql_duration_seconds', (('endpoint', endpoint),),
+                     g.pop('sql_seconds', 0.0), self.DURATION_BUCKETS)
+    
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+    
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_query_start'].pop()
+        self.increment('db_statements_total')
+        if has_request_context() and 'sql_statements' in g:
+            g.sql_statements += 1
+            g.sql_seconds += elapsed
+        
+        if elapsed >= self.slow_query_seconds:
+            self.increment('db_slow_queries_total')
+            self.app.logger.warning('Slow query (%.1f ms) in %s: %s', elapsed * 1000,
+                                    request.endpoint if has_request_context() else '-',
+                                    ' '.join(statement.split())[:1000])
+    
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        def label_text(labels):
+            if not labels:
+                return ''
+            return '{' + ','.join(
+                '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels
+            ) + '}'
+
+        with self.lock:
+            histograms = {key: (h[0], list(h[1]), h[2], h[3]) for key, h in self.histograms.items()}
+            counters = dict(self.counters)
+            counters.update(self.gauges)
+        
+        lines = []
+        for name, (kind, help_text) in self.HELP.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            if kind in ('counter', 'gauge'):
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{label_text(labels)} {value}')
+                continue
+            for (metric, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{label_text(labels + (("le", repr(float(bound))),))} {cumulative}')
+                lines.append(f'{name}_bucket{label_text(labels + (("le", "+Inf"),))} {count}')
+                lines.append(f'{name}_sum{label_text(labels)} {total}')
+                lines.append(f'{name}_count{label_text(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+request_metrics = RequestMetrics()
+
+class LRUCache:
+    """Thread-safe bounded LRU cache with optional TTL and hit/miss counters"""
+    
+    _missing = object()
+    
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.data.get(key, self._missing)
+            if entry is not self._missing and (self.ttl is None or entry[1] > time.monotonic()):
+                self.data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not self._missing:
+                del self.data[key]
+            self.misses += 1
+            return default
+    
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self.lock:
+            self.data[key] = (value, expires)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+    
+    def configure(self, maxsize, ttl=None):
+        with self.lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self.data.clear()
+    
+    def invalidate(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.data.pop(key, None)
+    
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+    
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self.data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+# (user_id, barkod) -> product dict, or None for a known miss
+barcode_cache = LRUCache(10000, 60)
+
+# user_id -> product count, for the product list total when the stats table is off
+product_count_cache = LRUCache(10000, 60)
+
+# user_id -> InventorySnapshot, valid while its data version is current
+inventory_snapshot_cache = LRUCache(8)
+
+# user_id -> StockAnalysisState, extended from the ledger on each use
+stock_analysis_cache = LRUCache(8)
+
+class TenantMoving(ServiceUnavailable):
+    description = 'Verileriniz başka bir veritabanına taşınıyor. Lütfen biraz sonra tekrar deneyin.'
+
+class TenantRouter:
+    """Routes each user's rows to the store the tenant map assigns them.
+
+    Stores are named in TENANT_DATABASES and registered as `tenant_<name>` binds.
+    Everything except users and the map itself follows the user: products are
+    joined and committed together with the ledger, alerts, stats and activity
+    log, so they have to live in one database.
+    """
+    
+    SHARED_TABLES = frozenset({'users', 'tenant_placements', 'user_agents', 'activity_archives'})
+    
+    def __init__(self):
+        self.stores = {}
+        self.placements = LRUCache(10000, 10)
+    
+    def init_app(self, app):
+        """Add a bind per store; must run before db.init_app creates the engines"""
+        binds = dict(app.config['SQLALCHEMY_BINDS'])
+        self.stores = {}
+        for name, url in app.config['TENANT_DATABASES'].items():
+            options = {'url': url.replace('postgres://', 'postgresql://', 1), 'pool_pre_ping': True, 'pool_recycle': 300}
+            if not url.startswith('sqlite'):
+                options.update(pool_size=app.config['TENANT_POOL_SIZE'],
+                               max_overflow=app.config['TENANT_POOL_MAX_OVERFLOW'])
+            binds[f'tenant_{name}'] = options
+            self.stores[name] = f'tenant_{name}'
+        app.config['SQLALCHEMY_BINDS'] = binds
+        self.placements.configure(10000, app.config['TENANT_MAP_CACHE_TTL'])
+        app.extensions['tenant_router'] = self
+    
+    def engine(self, magaza):
+        return db.engines[self.stores[magaza]] if magaza else db.engine
+    
+    def placement(self, user_id, cached=True):
+        """(store name or None for the primary, durum) of a user"""
+        if not self.stores:
+            return (None, 'aktif')
+        yer = self.placements.get(user_id) if cached else None
+        if yer is None:
+            # Own connection to the primary: may run in the middle of a session flush
+            with db.engine.connect() as conn:
+                row = conn.execute(db.select(TenantPlacement.magaza, TenantPlacement.durum)
+                                   .where(TenantPlacement.user_id == user_id)).first()
+            yer = (row.magaza, row.durum) if row else (None, 'aktif')
+            self.placements.set(user_id, yer)
+        return yer
+    
+    def set_placement(self, user_id, magaza, durum):
+        with db.engine.begin() as conn:
+            conn.execute(db.delete(TenantPlacement).where(TenantPlacement.user_id == user_id))
+            if magaza is not None or durum != 'aktif':
+                conn.execute(db.insert(TenantPlacement).values(
+                    user_id=user_id, magaza=magaza, durum=durum, guncelleme=datetime.utcnow()))
+        self.placements.invalidate(user_id)
+    
+    def bind_for(self, mapper, clause, writing):
+        """Bind key for a statement on a tenant table, or None for the default routing"""
+        if not self.stores:
+            return None
+        if mapper is not None:
+            tables = [db.inspect(mapper).local_table]
+        elif clause is not None:
+            tables = find_tables(clause, include_crud=True)
+        else:
+            return None
+        if not tables or all(table.name in self.SHARED_TABLES for table in tables):
+            return None
+        
+        if 'db_tenant' in g:
+            return g.db_tenant
+        if not (has_request_context() and current_user.is_authenticated):
+            return None
+        magaza, durum = self.placement(current_user.id)
+        if writing and durum == 'tasiniyor':
+            raise TenantMoving(retry_after=30)
+        return self.stores.get(magaza)
+    
+    @contextlib.contextmanager
+    def scope(self, user_id=None, magaza=None):
+        """Route tenant tables to a user's (or a named) store outside requests"""
+        if user_id is not None:
+            magaza = self.placement(user_id)[0]
+        onceki = g.pop('db_tenant', self)
+        g.db_tenant = self.stores.get(magaza)
+        try:
+            yield
+        finally:
+            if onceki is self:
+                g.pop('db_tenant', None)
+            else:
+                g.db_tenant = onceki
+    
+    def all_stores(self):
+        return [None, *self.stores]
+    
+    def group_by_store(self, rows):
+        """{store: rows} for row dicts carrying a user_id"""
+        if not self.stores:
+            return {None: rows}
+        gruplar = {}
+        for row in rows:
+            gruplar.setdefault(self.placement(row['user_id'])[0], []).append(row)
+        return gruplar
+
+tenant_router = TenantRouter()
+
+class _LazyStory(list):
+    """Flowable list refilled from a generator as ReportLab consumes it from the front"""
+    
+    def __init__(self, flowables):
+        super().__init__()
+        self.source = iter(flowables)
+    
+    def __len__(self):
+        while super().__len__() < 2:
+            flowable = next(self.source, None)
+            if flowable is None:
+                break
+            self.append(flowable)
+        return super().__len__()
+
+class PdfReportJobs:
+    """Background PDF report generation.
+
+    A job id is derived from the user's data version, so an unchanged
+    inventory maps to an already finished file. State lives on disk
+    (.pdf / .part / .hata) and every worker process sees the same jobs: the
+    .part marker is created atomically when a job is queued, so only one
+    process renders it, and a marker older than PDF_REPORT_TIMEOUT (left by a
+    killed worker) no longer counts as running.
+    """
+    
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        self.pid = None
+        self.lock = threading.Lock()
+        self.queued = set()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.app = app
+        app.extensions['pdf_reports'] = self
+    
+    def _get_executor(self):
+        # One pool per process, created after fork
+        with self.lock:
+            if self.executor is None or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.queued = set()
+                self.executor = ThreadPoolExecutor(max_workers=self.app.config['PDF_REPORT_WORKERS'],
+                                                   thread_name_prefix='pdf-report')
+            return self.executor
+    
+    def job_id(self, user_id, version):
+        return hashlib.sha1(f'{user_id}:{version}'.encode()).hexdigest()[:20]
+    
+    def path(self, user_id, job_id, suffix='.pdf'):
+        return os.path.join(self.app.config['REPORT_CACHE_DIR'], f'rapor_{user_id}_{job_id}{suffix}')
+    
+    def _marker_age(self, part):
+        try:
+            return time.time() - os.path.getmtime(part)
+        except FileNotFoundError:
+            return None
+    
+    def status(self, user_id, job_id):
+        if os.path.exists(self.path(user_id, job_id)):
+            return 'hazir'
+        if os.path.exists(self.path(user_id, job_id, '.hata')):
+            return 'hata'
+        age = self._marker_age(self.path(user_id, job_id, '.part'))
+        if age is not None and age < self.app.config['PDF_REPORT_TIMEOUT']:
+            with self.lock:
+                return 'bekliyor' if (user_id, job_id) in self.queued else 'hazirlaniyor'
+        return 'bulunamadi'
+    
+    def submit(self, user_id, version):
+        """Queue a report for this data version unless it is cached or already running"""
+        job_id = self.job_id(user_id, version)
+        durum = self.status(user_id, job_id)
+        if durum in ('hazir', 'hazirlaniyor', 'bekliyor'):
+            return job_id, durum
+        
+        os.makedirs(self.app.config['REPORT_CACHE_DIR'], exist_ok=True)
+        hata_path = self.path(user_id, job_id, '.hata')
+        if os.path.exists(hata_path):
+            os.remove(hata_path)
+        part = self.path(user_id, job_id, '.part')
+        age = self._marker_age(part)
+        if age is not None and age >= self.app.config['PDF_REPORT_TIMEOUT']:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(part)
+        # The marker claims the job for this process; another worker may have just done so
+        try:
+            os.close(os.open(part, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return job_id, 'hazirlaniyor'
+        
+        executor = self._get_executor()
+        with self.lock:
+            self.queued.add((user_id, job_id))
+        executor.submit(self._run, user_id, job_id)
+        return job_id, 'bekliyor'
+    
+    def _run(self, user_id, job_id):
+        part = self.path(user_id, job_id, '.part')
+        with self.lock:
+            self.queued.discard((user_id, job_id))
+        try:
+            os.utime(part)  # the timeout counts from the start of rendering, not queueing
+        except FileNotFoundError:
+            return  # marker expired while queued and another process took the job
+        try:
+            with self.app.app_context(), tenant_router.scope(user_id):
+                build_pdf_report(user_id, part)
+            os.replace(part, self.path(user_id, job_id))
+            self._remove_stale(user_id, job_id)
+        except Exception as exc:
+            self.app.logger.exception('PDF report %s failed', job_id)
+            with open(self.path(user_id, job_id, '.hata'), 'w') as f:
+                f.write(str(exc))
+            if os.path.exists(part):
+                os.remove(part)
+    
+    def _remove_stale(self, user_id, job_id):
+        # Older versions of this user's report can never be served again
+        prefix = f'rapor_{user_id}_'
+        keep = os.path.basename(self.path(user_id, job_id))
+        for name in os.listdir(self.app.config['REPORT_CACHE_DIR']):
+            if name.startswith(prefix) and name.endswith('.pdf') and name != keep:
+                try:
+                    os.remove(os.path.join(self.app.config['REPORT_CACHE_DIR'], name))
+                except OSError:
+                    pass
+
+pdf_reports = PdfReportJobs()
+
+class PasswordHasherBusy(ServiceUnavailable):
+    description = 'Sistem şu anda yoğun, lütfen birkaç saniye sonra tekrar deneyin.'
+
+class PasswordHasher:
+    """Runs bcrypt on a small per-process pool instead of the request thread.
+
+    At most PASSWORD_HASH_WORKERS hashes run at once and PASSWORD_HASH_QUEUE_SIZE
+    more may wait; past that, or after PASSWORD_HASH_TIMEOUT, callers get
+    PasswordHasherBusy (503) so a login burst can't stall every other route.
+    """
+    
+    BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        self.slots = None
+        self.pid = None
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.app = app
+        self.executor = None
+        app.extensions['password_hasher'] = self
+    
+    def _get_executor(self):
+        # One pool per process, created after fork
+        with self.lock:
+            if self.executor is None or self.pid != os.getpid():
+                self.pid = os.getpid()
+                workers = self.app.config['PASSWORD_HASH_WORKERS']
+                self.slots = threading.BoundedSemaphore(workers + self.app.config['PASSWORD_HASH_QUEUE_SIZE'])
+                self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+            return self.executor
+    
+    def _run(self, islem, func, *args):
+        executor = self._get_executor()
+        slots = self.slots
+        if not slots.acquire(blocking=False):
+            request_metrics.increment('password_hash_rejected_total', (('neden', 'kuyruk_dolu'),))
+            raise PasswordHasherBusy(retry_after=2)
+        queued = time.perf_counter()
+        
+        def timed():
+            started = time.perf_counter()
+            request_metrics.observe('password_hash_queue_wait_seconds', (), started - queued, self.BUCKETS)
+            try:
+                return func(*args)
+            finally:
+                request_metrics.observe('password_hash_seconds', (('islem', islem),),
+                                        time.perf_counter() - started, self.BUCKETS)
+        
+        future = executor.submit(timed)
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.app.config['PASSWORD_HASH_TIMEOUT'])
+        except FutureTimeoutError:
+            # The hash still finishes in the pool and frees its slot then
+            request_metrics.increment('password_hash_rejected_total', (('neden', 'zaman_asimi'),))
+            raise PasswordHasherBusy(retry_after=2)
+    
+    def hash(self, password):
+        return self._run('hash', bcrypt.generate_password_hash, password).decode('utf-8')
+    
+    def verify(self, password_hash, password):
+        return self._run('verify', bcrypt.check_password_hash, password_hash, password)
+    
+    def needs_rehash(self, password_hash):
+        """True when the hash was made with a different cost than BCRYPT_LOG_ROUNDS ($2b$<cost>$...)"""
+        try:
+            return int(password_hash.split('$')[2]) != self.app.config['BCRYPT_LOG_ROUNDS']
+        except (IndexError, ValueError):
+            return False
+
+password_hasher = PasswordHasher()
+
+class InProcessBroker:
+    """Live update subscribers of this process only.
+
+    Each subscriber gets a bounded queue; one that falls behind is told to
+    reload instead of holding up the writers.
+    """
+    
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.subscribers = {}
+    
+    def publish(self, user_id, mesaj):
+        with self.lock:
+            aboneler = list(self.subscribers.get(user_id, ()))
+        for abone in aboneler:
+            try:
+                abone.queue.put_nowait(mesaj)
+            except queue.Full:
+                abone.overflowed = True
+    
+    def has_subscribers(self, user_id):
+        return bool(self.subscribers.get(user_id))
+    
+    def subscribe(self, user_id):
+        abone = _InProcessSubscription(self, user_id)
+        with self.lock:
+            self.subscribers.setdefault(user_id, set()).add(abone)
+        return abone
+    
+    def unsubscribe(self, abone):
+        with self.lock:
+            aboneler = self.subscribers.get(abone.user_id, set())
+            aboneler.discard(abone)
+            if not aboneler:
+                self.subscribers.pop(abone.user_id, None)
+
+class _InProcessSubscription:
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=broker.queue_size)
+        self.overflowed = False
+    
+    def get(self, timeout):
+        if self.overflowed:
+            # Whatever is still queued is stale once the page reloads
+            self.overflowed = False
+            self.queue = queue.Queue(maxsize=self.broker.queue_size)
+            return json.dumps({'olay': 'yenile', 'veri': None, 'surum': None})
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+    
+    def close(self):
+        self.broker.unsubscribe(self)
+
+class RedisBroker:
+    """Live updates over Redis pub/sub, shared by every worker and host"""
+    
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+    
+    def channel(self, user_id):
+        return f'stok_takip:canli:{user_id}'
+    
+    def publish(self, user_id, mesaj):
+        self.client.publish(self.channel(user_id), mesaj)
+    
+    def has_subscribers(self, user_id):
+        return self.client.pubsub_numsub(self.channel(user_id))[0][1] > 0
+    
+    def subscribe(self, user_id):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel(user_id))
+        return _RedisSubscription(pubsub)
+
+class _RedisSubscription:
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+    
+    def get(self, timeout):
+        message = self.pubsub.get_message(timeout=timeout)
+        return message['data'].decode() if message else None
+    
+    def close(self):
+        self.pubsub.close()
+
+class LiveUpdates:
+    """Per-user pub/sub behind the /canli Server-Sent Events stream.
+
+    Writes queue small deltas with queue_live_update(); they are published
+    only after the transaction commits. The broker is in-process unless
+    LIVE_UPDATES_URL points at a shared backend (redis://...).
+    """
+    
+    # Above this many deltas in one commit, pages are told to reload instead
+    MAX_DELTAS = 200
+    
+    def __init__(self, app=None):
+        self.app = None
+        self.broker = None
+        self.lock = threading.Lock()
+        self.streams = 0
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.app = app
+        url = app.config['LIVE_UPDATES_URL']
+        self.broker = RedisBroker(url) if url else InProcessBroker(app.config['LIVE_UPDATES_QUEUE_SIZE'])
+        app.extensions['live_updates'] = self
+    
+    def publish(self, user_id, olay, veri=None, surum=None):
+        if self.broker is None:
+            return
+        try:
+            self.broker.publish(user_id, json.dumps({'olay': olay, 'veri': veri, 'surum': surum}, default=str))
+        except Exception:
+            # The write has already committed; a missed delta only costs the page a reload later
+            self.app.logger.exception('Live update for user %s could not be published', user_id)
+    
+    def has_subscribers(self, user_id):
+        if self.broker is None:
+            return False
+        try:
+            return self.broker.has_subscribers(user_id)
+        except Exception:
+            return False
+    
+    def subscribe(self, user_id):
+        return self.broker.subscribe(user_id)
+    
+    def acquire_stream(self):
+        """Reserve a stream slot; each open stream holds a server thread"""
+        with self.lock:
+            if self.streams >= self.app.config['LIVE_UPDATES_MAX_STREAMS']:
+                return False
+            self.streams += 1
+            request_metrics.set_gauge('live_update_streams', (), self.streams)
+            return True
+    
+    def release_stream(self):
+        with self.lock:
+            self.streams -= 1
+            request_metrics.set_gauge('live_update_streams', (), self.streams)
+
+live_updates = LiveUpdates()
+
+def queue_live_update(user_id, olay, veri=None):
+    """Send a delta to the user's live pages once the current transaction commits"""
+    db.session.info.setdefault('canli_olaylar', []).append((user_id, olay, veri))
+
+@db.event.listens_for(RoutingSession, 'after_commit')
+def _publish_live_updates(session):
+    olaylar = session.info.pop('canli_olaylar', None)
+    surumler = session.info.pop('canli_surumler', {})
+    for user_id, olay, veri in olaylar or ():
+        live_updates.publish(user_id, olay, veri, surumler.get(user_id))
+
+@db.event.listens_for(RoutingSession, 'after_soft_rollback')
+def _drop_live_updates(session, previous_transaction):
+    session.info.pop('canli_olaylar', None)
+    session.info.pop('canli_surumler', None)
+
+def _pdf_fonts():
+    """(regular, bold) font names; a TTF font is needed for ş, ğ, ı"""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    
+    font_path = current_app.config['PDF_FONT_PATH']
+    if font_path and os.path.exists(font_path):
+        if 'RaporFont' not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont('RaporFont', font_path))
+        return 'RaporFont', 'RaporFont'
+    return 'Helvetica', 'Helvetica-Bold'
+
+def build_pdf_report(user_id, path):
+    """Write the stock report as a sequence of LongTables, streaming rows from the database"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, LongTable, TableStyle, Paragraph, Spacer
+    
+    font, bold_font = _pdf_fonts()
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontName=bold_font,
+                                 fontSize=18, spaceAfter=30, alignment=1)
+    normal_style = ParagraphStyle('RaporNormal', parent=styles['Normal'], fontName=font)
+    rows_per_table = current_app.config['PDF_ROWS_PER_TABLE']
+    
+    headers = ['Ürün Adı', 'Barkod', 'Kategori', 'Stok', 'Birim Fiyat', 'Toplam Değer', 'Durum']
+    table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), bold_font),
+        ('FONTNAME', (0, 1), (-1, -1), font),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black)
+    ])
+    col_widths = [1.9*inch, 1.2*inch, 0.9*inch, 0.6*inch, 0.9*inch, 1*inch, 0.6*inch]
+    
+    def story():
+        istatistikler = get_dashboard_stats(user_id)
+        yield Paragraph("STOK RAPORU", title_style)
+        yield Paragraph(f"Rapor Tarihi: {datetime.now().strftime('%d.%m.%Y %H:%M')}<br/>"
+                        f"Toplam Ürün Sayısı: {istatistikler['toplam_urun_sayisi']}<br/>"
+                        f"Toplam Stok Değeri: {istatistikler['toplam_stok_degeri']:.2f} ₺<br/>"
+                        f"Düşük Stoklu Ürünler: {istatistikler['dusuk_stoklu_urunler']}", normal_style)
+        yield Spacer(1, 20)
+        
+        rows = db.session.query(
+            Urun.ad, Urun.barkod, Urun.kategori, Urun.stok_adedi, Urun.birim_fiyat, Urun.stok_durumu
+        ).filter(Urun.user_id == user_id).order_by(Urun.kategori, Urun.ad).yield_per(rows_per_table)
+        
+        # Bounded tables keep ReportLab's layout work per table small
+        data = [headers]
+        for ad, barkod, kategori, stok, fiyat, durum in rows:
+            data.append([ad[:40], barkod, kategori or '', str(stok), f"{fiyat:.2f} ₺", f"{stok * fiyat:.2f} ₺", durum])
+            if len(data) > rows_per_table:
+                yield LongTable(data, colWidths=col_widths, repeatRows=1, style=table_style)
+                data = [headers]
+        if len(data) > 1:
+            yield LongTable(data, colWidths=col_widths, repeatRows=1, style=table_style)
+    
+    doc = SimpleDocTemplate(path, pagesize=A4)
+    doc.build(_LazyStory(story()))
+
+class TokenUser(UserMixin):
+    """API identity from a token's user id and the cached users row fields"""
+    
+    def __init__(self, user_id, username, role):
+        self.id = user_id
+        self.username = username
+        self.role = role
+    
+    def __repr__(self):
+        return f'<TokenUser {self.username}>'
+
+# user_id -> (is_active, username, role); a short TTL bounds how long a deactivated
+# or demoted user's tokens keep their old rights
+api_user_cache = LRUCache(10000, 30)
+
+@login_manager.request_loader
+def load_user_from_token(request):
+    """Authenticate /api/ requests carrying an HS256 token from generate_jwt_token()"""
+    if not request.path.startswith('/api/'):
+        return None
+    auth = request.headers.get('Authorization', '')
+    if not auth.startswith('Bearer '):
+        return None
+    
+    import jwt
+    try:
+        claims = jwt.decode(auth[7:], current_app.config['SECRET_KEY'], algorithms=['HS256'],
+                            options={'require': ['exp', 'sub']})
+        user_id = int(claims['sub'])
+    except (jwt.InvalidTokenError, ValueError):
+        return None
+    
+    row = api_user_cache.get(user_id, LRUCache._missing)
+    if row is LRUCache._missing:
+        row = db.session.query(User.is_active, User.username, User.role).filter_by(id=user_id).first()
+        row = tuple(row) if row else (False, None, None)
+        api_user_cache.set(user_id, row)
+    is_active, username, role = row
+    return TokenUser(user_id, username, role) if is_active else None
+
+@login_manager.unauthorized_handler
+def unauthorized():
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 'Kimlik doğrulaması gerekli'}), 401
+    flash(login_manager.login_message, login_manager.login_message_category)
+    return redirect(login_url(login_manager.login_view, next_url=request.url))
+
+def lookup_barcodes(user_id, barkodlar):
+    """Resolve barcodes to product dicts (None when missing), cache first"""
+    sonuc, eksik = {}, []
+    for barkod in barkodlar:
+        cached = barcode_cache.get((user_id, barkod), LRUCache._missing)
+        if cached is LRUCache._missing:
+            eksik.append(barkod)
+        else:
+            sonuc[barkod] = cached
+    
+    # One IN query per chunk, served by the unique (barkod, user_id) index
+    for i in range(0, len(eksik), 500):
+        chunk = eksik[i:i + 500]
+        bulunan = {p.barkod: p.to_dict() for p in Urun.query.filter(
+            Urun.user_id == user_id, Urun.barkod.in_(chunk)
+        ).all()}
+        for barkod in chunk:
+            sonuc[barkod] = bulunan.get(barkod)
+            barcode_cache.set((user_id, barkod), sonuc[barkod])
+    return sonuc
+
+def compact_activity_details(action, details):
+    """Keep only the fields an update changed in its old_data/new_data payloads"""
+    if action != 'update' or not isinstance(details, dict) \
+            or not isinstance(details.get('old_data'), dict) or not isinstance(details.get('new_data'), dict):
+        return details
+    eski, yeni = details['old_data'], details['new_data']
+    degisen = [alan for alan in {**eski, **yeni} if eski.get(alan) != yeni.get(alan)]
+    return {**details, 'old_data': {alan: eski.get(alan) for alan in degisen},
+            'new_data': {alan: yeni.get(alan) for alan in degisen}}
+
+def log_user_activity(action, resource_type=None, resource_id=None, details=None):
+    """Log user activity for audit trail"""
+    if current_user.is_authenticated:
+        record = {
+            'user_id': current_user.id,
+            'action': action,
+            'resource_type': resource_type,
+            'resource_id': resource_id,
+            'details': compact_activity_details(action, details),
+            'ip_address': request.remote_addr,
+            'user_agent': request.headers.get('User-Agent'),
+            'timestamp': datetime.utcnow()
+        }
+        if current_app.config['AUDIT_BUFFER_ENABLED']:
+            audit_buffer.enqueue(record)
+        else:
+            db.session.add(UserActivity(**record))
+            db.session.commit()
+
+def user_agent_ids(degerler, cache):
+    """{user agent: id} from the user_agents lookup table, adding unknown ones (caller commits)"""
+    sonuc, eksik = {}, {}
+    for deger in degerler:
+        ua_id = cache.get(deger)
+        if ua_id is None:
+            eksik[hashlib.sha1(deger.encode()).hexdigest()] = deger
+        else:
+            sonuc[deger] = ua_id
+    if eksik:
+        bilinen = dict(db.session.execute(
+            db.select(UserAgent.ozet, UserAgent.id).where(UserAgent.ozet.in_(list(eksik)))).all())
+        yeni = [{'ozet': ozet, 'deger': deger} for ozet, deger in eksik.items() if ozet not in bilinen]
+        if yeni:
+            db.session.execute(db.insert(UserAgent), yeni)
+            bilinen.update(db.session.execute(db.select(UserAgent.ozet, UserAgent.id)
+                                              .where(UserAgent.ozet.in_([row['ozet'] for row in yeni]))).all())
+        for ozet, deger in eksik.items():
+            sonuc[deger] = bilinen[ozet]
+            cache.set(deger, bilinen[ozet])
+    return sonuc
+
+def _finish_archive_deletes(magaza, chunk_size):
+    """Delete live rows of recorded archive runs whose deletes have not completed"""
+    runs = db.session.query(ActivityArchive.kesim, ActivityArchive.son_id)\
+        .filter(ActivityArchive.magaza == magaza, ActivityArchive.silindi.is_(False)).distinct().all()
+    for kesim, son_id in runs:
+        while True:
+            ids = db.select(UserActivity.id).where(UserActivity.id <= son_id, UserActivity.timestamp < kesim)\
+                .limit(chunk_size).scalar_subquery()
+            deleted = db.session.execute(db.delete(UserActivity).where(UserActivity.id.in_(ids))
+                                         .execution_options(synchronize_session=False)).rowcount
+            db.session.commit()
+            if not deleted:
+                break
+        db.session.query(ActivityArchive).filter(
+            ActivityArchive.magaza == magaza, ActivityArchive.son_id == son_id, ActivityArchive.kesim == kesim
+        ).update({'silindi': True}, synchronize_session=False)
+        db.session.commit()
+
+def archive_activities(kesim, magaza=None, chunk_size=5000):
+    """Move a store's activities older than kesim into gzip JSON-lines files per month.
+
+    Rows are read in id order, chunk by chunk, and written straight into the
+    month files, so memory stays flat. User agents become user_agents ids and
+    update payloads keep only changed fields. The files are recorded in
+    activity_archives before any row is deleted; if a run stops after that,
+    the next run finishes its deletes. Returns the number of archived rows.
+    """
+    import gzip
+    kok = current_app.config['AUDIT_ARCHIVE_DIR']
+    if not kok:
+        raise RuntimeError('AUDIT_ARCHIVE_DIR is not set')
+    with tenant_router.scope(magaza=magaza):
+        _finish_archive_deletes(magaza, chunk_size)
+        son_id = db.session.query(db.func.max(UserActivity.id)).filter(UserActivity.timestamp < kesim).scalar()
+        if son_id is None:
+            return 0
+        
+        dosyalar = {}  # ay -> open file and its manifest values
+        ajanlar = LRUCache(10000)
+        last_id = 0
+        try:
+            while True:
+                rows = db.session.execute(
+                    db.select(UserActivity.id, UserActivity.user_id, UserActivity.action, UserActivity.resource_type,
+                              UserActivity.resource_id, UserActivity.details, UserActivity.ip_address,
+                              UserActivity.user_agent, UserActivity.timestamp)
+                    .where(UserActivity.id > last_id, UserActivity.id <= son_id, UserActivity.timestamp < kesim)
+                    .order_by(UserActivity.id).limit(chunk_size)
+                ).all()
+                if not rows:
+                    break
+                ua_ids = user_agent_ids({row.user_agent for row in rows if row.user_agent}, ajanlar)
+                for row in rows:
+                    ay = (row.timestamp.year, row.timestamp.month)
+                    dosya = dosyalar.get(ay)
+                    if dosya is None:
+                        yol = os.path.join(magaza or 'ana', '%04d-%02d' % ay, f'aktiviteler-{son_id}.jsonl.gz')
+                        os.makedirs(os.path.dirname(os.path.join(kok, yol)), exist_ok=True)
+                        dosya = dosyalar[ay] = {
+                            'akis': gzip.open(os.path.join(kok, yol + '.part'), 'wt', encoding='utf-8'),
+                            'yol': yol, 'satir': 0, 'ilk': row.timestamp, 'son': row.timestamp
+                        }
+                    # user_id first: readers skip other users' lines without parsing them
+                    dosya['akis'].write(json.dumps({
+                        'user_id': row.user_id,
+                        'id': row.id,
+                        'timestamp': row.timestamp.isoformat(),
+                        'action': row.action,
+                        'resource_type': row.resource_type,
+                        'resource_id': row.resource_id,
+                        'details': compact_activity_details(row.action, row.details),
+                        'ip_address': row.ip_address,
+                        'user_agent_id': ua_ids.get(row.user_agent)
+                    }, ensure_ascii=False, separators=(',', ':')) + '\n')
+                    dosya['satir'] += 1
+                    dosya['ilk'] = min(dosya['ilk'], row.timestamp)
+                    dosya['son'] = max(dosya['son'], row.timestamp)
+                last_id = rows[-1].id
+                db.session.commit()  # new user agents; also ends the read transaction
+        except BaseException:
+            for dosya in dosyalar.values():
+                dosya['akis'].close()
+                os.remove(os.path.join(kok, dosya['yol'] + '.part'))
+            raise
+        
+        for dosya in dosyalar.values():
+            dosya['akis'].close()
+            path = os.path.join(kok, dosya['yol'])
+            with open(path + '.part', 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(path + '.part', path)
+            db.session.add(ActivityArchive(
+                magaza=magaza, ay=os.path.basename(os.path.dirname(path)), dosya=dosya['yol'],
+                satir_sayisi=dosya['satir'], ilk_zaman=dosya['ilk'], son_zaman=dosya['son'],
+                kesim=kesim, son_id=son_id))
+        db.session.commit()
+        _finish_archive_deletes(magaza, chunk_size)
+        return sum(dosya['satir'] for dosya in dosyalar.values())
+
+def read_activity_archive(path, user_id):
+    """One user's records from an archive file; other users' lines are not parsed"""
+    import gzip
+    prefix = f'{{"user_id":{int(user_id)},'
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith(prefix):
+                yield json.loads(line)
+
+def activity_history(user_id, baslangic, bitis, sonra=None, adet=100, islem=None):
+    """(activities in [baslangic, bitis) oldest first, next cursor) from the live table and the archives.
+
+    Goes month by month, merging that month's archive files with live rows,
+    so at most one month of the user's archived activities is in memory.
+    Months with neither an archive file nor a live row are skipped, so the
+    cost follows the data rather than the width of the range.
+    sonra is a (timestamp, id) position from decode_cursor().
+    """
+    bitis = min(bitis, datetime.utcnow())
+    arsivler = {}
+    for ay, dosya in db.session.query(ActivityArchive.ay, ActivityArchive.dosya).filter(
+            ActivityArchive.ilk_zaman < bitis, ActivityArchive.son_zaman >= baslangic).order_by(ActivityArchive.id):
+        arsivler.setdefault(ay, []).append(os.path.join(current_app.config['AUDIT_ARCHIVE_DIR'], dosya))
+    
+    kayitlar = []
+    bas = max(baslangic, sonra[0]) if sonra else baslangic
+    while bas < bitis and len(kayitlar) < adet:
+        # Next month with data: the user's next live row or the next archived month
+        canli_ilk = db.session.query(db.func.min(UserActivity.timestamp)).filter(
+            UserActivity.user_id == user_id, UserActivity.timestamp >= bas, UserActivity.timestamp < bitis)
+        if islem is not None:
+            canli_ilk = canli_ilk.filter(UserActivity.action == islem)
+        adaylar = [datetime.strptime(ay, '%Y-%m') for ay in arsivler if ay >= bas.strftime('%Y-%m')]
+        canli_ilk = canli_ilk.scalar()
+        if canli_ilk is not None:
+            adaylar.append(canli_ilk)
+        if not adaylar:
+            break
+        ilk = min(adaylar)
+        ay = datetime(ilk.year, ilk.month, 1)
+        sonraki_ay = (ay + timedelta(days=32)).replace(day=1)
+        alt, ust = max(baslangic, ay), min(bitis, sonraki_ay)
+        aday = []
+        for path in arsivler.get(ay.strftime('%Y-%m'), []):
+            for kayit in read_activity_archive(path, user_id):
+                zaman = datetime.fromisoformat(kayit['timestamp'])
+                if alt <= zaman < ust and (islem is None or kayit['action'] == islem) \
+                        and (sonra is None or (zaman, kayit['id']) > sonra):
+                    del kayit['user_id']
+                    aday.append((zaman, kayit['id'], kayit))
+        
+        canli = UserActivity.query.filter(UserActivity.user_id == user_id,
+                                          UserActivity.timestamp >= alt, UserActivity.timestamp < ust)
+        if islem is not None:
+            canli = canli.filter(UserActivity.action == islem)
+        if sonra is not None:
+            canli = canli.filter(db.tuple_(UserActivity.timestamp, UserActivity.id) > sonra)
+        for activity in canli.order_by(UserActivity.timestamp, UserActivity.id).limit(adet - len(kayitlar)):
+            aday.append((activity.timestamp, activity.id, activity.to_dict()))
+        
+        aday.sort(key=lambda item: item[:2])
+        kayitlar.extend(aday[:adet - len(kayitlar)])
+        bas = sonraki_ay
+    
+    # Archived records carry a user_agents id instead of the string
+    ua_ids = {kayit['user_agent_id'] for _, _, kayit in kayitlar if kayit.get('user_agent_id')}
+    ajanlar = dict(db.session.query(UserAgent.id, UserAgent.deger).filter(UserAgent.id.in_(ua_ids)).all()) if ua_ids else {}
+    for _, _, kayit in kayitlar:
+        if 'user_agent_id' in kayit:
+            kayit['user_agent'] = ajanlar.get(kayit.pop('user_agent_id'))
+            kayit['arsiv'] = True
+        else:
+            kayit['arsiv'] = False
+    
+    imlec = encode_position(*kayitlar[-1][:2]) if len(kayitlar) == adet else None
+    return [kayit for _, _, kayit in kayitlar], imlec
+
+_TR_LOWER = str.maketrans({'İ': 'i', 'I': 'ı'})
+_TR_ASCII = str.maketrans('çğıöşüâîû', 'cgiosuaiu')
+
+def normalize_search_text(text):
+    """Turkish-aware case folding (İ/ı, Ş/ş...) with diacritics folded to ASCII"""
+    return (text or '').translate(_TR_LOWER).lower().translate(_TR_ASCII)
+
+def search_document(ad, barkod, kategori, aciklama):
+    return normalize_search_text(' '.join(filter(None, [ad, barkod, kategori, aciklama])))
+
+def update_search_index(product):
+    """Refresh the product's search document (caller commits)"""
+    icerik = search_document(product.ad, product.barkod, product.kategori, product.aciklama)
+    if product.arama is None:
+        product.arama = UrunArama(user_id=product.user_id, icerik=icerik)
+    else:
+        product.arama.icerik = icerik
+
+def search_products(products_query, user_id, text):
+    """Restrict products_query to search matches, ordered by relevance"""
+    normalized = normalize_search_text(text).strip()
+    tokens = re.findall(r'\w+', normalized)
+    if not tokens:
+        return products_query
+    
+    dialect = db.session.get_bind(Urun).dialect.name
+    if dialect == 'sqlite':
+        terms = ' '.join(f'"{token}"*' for token in tokens)
+        products_fts = db.table('products_fts', db.column('rowid'))
+        # LIMIT -1 keeps the match set a materialized subquery; flattened into the
+        # join, SQLite drives from products and runs MATCH once per row (slow counts)
+        eslesme = db.select(
+            products_fts.c.rowid.label('product_id'),
+            db.literal_column('bm25(products_fts, 1.0, 0.0)').label('rank')
+        ).where(db.text('products_fts MATCH :fts_query').bindparams(
+            fts_query=f'user_id : {int(user_id)} AND icerik : ({terms})'
+        )).limit(-1).subquery('eslesme')
+        return products_query.join(eslesme, eslesme.c.product_id == Urun.id)\
+            .order_by(eslesme.c.rank)
+    
+    products_query = products_query.join(UrunArama, UrunArama.product_id == Urun.id)
+    if dialect == 'postgresql':
+        vector = db.func.to_tsvector('simple', UrunArama.icerik)
+        tsquery = db.func.to_tsquery('simple', ' & '.join(f'{token}:*' for token in tokens))
+        return products_query.filter(
+            vector.op('@@')(tsquery) | UrunArama.icerik.contains(normalized, autoescape=True)
+        ).order_by((db.func.ts_rank(vector, tsquery) + db.func.similarity(UrunArama.icerik, normalized)).desc())
+    
+    # Other dialects: unindexed, but still Turkish-aware
+    return products_query.filter(*[UrunArama.icerik.contains(token, autoescape=True) for token in tokens])
+
+def upsert_insert(model):
+    """INSERT statement supporting ON CONFLICT for the dialect of the model's database, or None"""
+    dialect = db.session.get_bind(model).dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert(model)
+
+def bulk_upsert(model, rows, index_elements, update_columns):
+    """INSERT ... ON CONFLICT DO UPDATE for a batch of row dicts (caller commits)"""
+    if not rows:
+        return
+    stmt = upsert_insert(model)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={column: stmt.excluded[column] for column in update_columns}
+        )
+        db.session.execute(stmt, rows)
+        return
+    
+    # Generic fallback: split into bulk insert and bulk update by primary key
+    table = model.__table__
+    keys = [table.c[column] for column in index_elements]
+    pk = table.primary_key.columns.values()[0]
+    existing = {
+        tuple(row[1:]): row[0]
+        for row in db.session.execute(
+            db.select(pk, *keys).where(db.tuple_(*keys).in_([tuple(r[c] for c in index_elements) for r in rows]))
+        )
+    }
+    inserts, updates = [], []
+    for row in rows:
+        key = tuple(row[c] for c in index_elements)
+        if key in existing:
+            updates.append({pk.key: existing[key], **{c: row[c] for c in update_columns}})
+        else:
+            inserts.append(row)
+    if inserts:
+        db.session.execute(db.insert(model), inserts)
+    if updates:
+        db.session.execute(db.update(model), updates)
+
+# Import columns: model field names plus the Excel export headers, so exports round-trip
+IMPORT_COLUMNS = {
+    'ad': 'ad', 'ürün adı': 'ad',
+    'barkod': 'barkod',
+    'stok_adedi': 'stok_adedi', 'stok adedi': 'stok_adedi',
+    'birim_fiyat': 'birim_fiyat', 'birim fiyat (₺)': 'birim_fiyat', 'birim fiyat': 'birim_fiyat',
+    'kategori': 'kategori',
+    'min_stok_seviyesi': 'min_stok_seviyesi', 'minimum stok seviyesi': 'min_stok_seviyesi',
+    'max_stok_seviyesi': 'max_stok_seviyesi', 'maksimum stok seviyesi': 'max_stok_seviyesi',
+    'aciklama': 'aciklama', 'açıklama': 'aciklama',
+}
+
+def iter_import_rows(stream, filename):
+    """Yield (line number, {field: text}) from a CSV or XLSX upload without loading it whole"""
+    if filename.lower().endswith('.xlsx'):
+        from openpyxl import load_workbook
+        wb = load_workbook(stream, read_only=True, data_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            headers = next(rows, None) or []
+            fields = [IMPORT_COLUMNS.get(str(h or '').strip().lower()) for h in headers]
+            for line, values in enumerate(rows, start=2):
+                yield line, {f: v for f, v in zip(fields, values) if f}
+        finally:
+            wb.close()
+    else:
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        header_line = text.readline()
+        # Excel in Turkish locales writes ';'-separated CSV
+        delimiter = ';' if header_line.count(';') > header_line.count(',') else ','
+        reader = csv.reader(itertools.chain([header_line], text), delimiter=delimiter)
+        headers = next(reader, None) or []
+        fields = [IMPORT_COLUMNS.get(h.strip().lower()) for h in headers]
+        for line, values in enumerate(reader, start=2):
+            yield line, {f: v for f, v in zip(fields, values) if f}
+
+def _import_formdata(values):
+    """Spreadsheet cell values as form data; blanks are left out so form defaults apply"""
+    formdata = MultiDict()
+    for field, value in values.items():
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        if isinstance(value, float) and value.is_integer() and field != 'birim_fiyat':
+            value = int(value)
+        value = str(value).strip()
+        if field == 'birim_fiyat' and ',' in value and '.' not in value:
+            value = value.replace(',', '.')  # Turkish decimal comma
+        formdata[field] = value
+    return formdata
+
+def import_products(user_id, rows, chunk_size=None, progress=None):
+    """Validate rows with ProductForm and upsert them on (barkod, user_id) in chunks.
+
+    Returns a report with counts, per-row errors and throughput.
+    """
+    chunk_size = chunk_size or current_app.config['IMPORT_CHUNK_SIZE']
+    started = time.perf_counter()
+    report = {'toplam': 0, 'eklenen': 0, 'guncellenen': 0, 'hatali': 0, 'hatalar': []}
+    fields = ['ad', 'barkod', 'stok_adedi', 'birim_fiyat', 'kategori',
+              'min_stok_seviyesi', 'max_stok_seviyesi', 'aciklama']
+    
+    def write_chunk(chunk):
+        barkodlar = list(chunk)
+        existing = dict(db.session.query(Urun.barkod, Urun.stok_adedi).filter(
+            Urun.user_id == user_id, Urun.barkod.in_(barkodlar)))
+        now = datetime.utcnow()
+        bulk_upsert(Urun, [
+            {**row, 'user_id': user_id, 'olusturma_tarihi': now, 'guncelleme_tarihi': now}
+            for row in chunk.values()
+        ], ['barkod', 'user_id'], fields[:1] + fields[2:] + ['guncelleme_tarihi'])
+        
+        # Search documents for the written rows
+        ids = dict(db.session.query(Urun.barkod, Urun.id).filter(
+            Urun.user_id == user_id, Urun.barkod.in_(barkodlar)))
+        bulk_upsert(UrunArama, [
+            {'product_id': ids[b], 'user_id': user_id,
+             'icerik': search_document(r['ad'], b, r['kategori'], r['aciklama'])}
+            for b, r in chunk.items()
+        ], ['product_id'], ['icerik'])
+        record_stock_movements(user_id, [
+            (ids[b], b, r['stok_adedi'] - existing.get(b, 0)) for b, r in chunk.items()
+        ], 'ice_aktarma', now)
+        evaluate_stock_alerts(user_id, [
+            (ids[b], b, r['stok_adedi'], r['min_stok_seviyesi'], r['max_stok_seviyesi']) for b, r in chunk.items()
+        ], now)
+        bump_data_version(user_id, now)
+        db.session.commit()
+        
+        barcode_cache.invalidate(*[(user_id, b) for b in barkodlar])
+        product_count_cache.invalidate(user_id)
+        report['eklenen'] += len(chunk) - len(existing)
+        report['guncellenen'] += len(existing)
+        if progress:
+            progress(report)
+    
+    # One form, re-processed per row: same validators as the web form without per-row binding cost
+    form = ProductForm(formdata=None, meta={'csrf': False})
+    chunk = {}
+    for line, values in rows:
+        report['toplam'] += 1
+        form.process(_import_formdata(values))
+        if not form.validate():
+            report['hatali'] += 1
+            if len(report['hatalar']) < 1000:
+                report['hatalar'].append({'satir': line, 'hatalar': dict(form.errors)})
+            continue
+        # Last occurrence of a barcode within a chunk wins
+        chunk[form.barkod.data] = {field: form[field].data for field in fields}
+        if len(chunk) >= chunk_size:
+            write_chunk(chunk)
+            chunk = {}
+    if chunk:
+        write_chunk(chunk)
+    
+    if current_app.config['STATS_TABLE_ENABLED'] and report['eklenen'] + report['guncellenen']:
+        rebuild_category_stats(user_id)
+    if report['eklenen'] + report['guncellenen']:
+        # Too many rows for deltas: open pages reload once the import is done
+        live_updates.publish(user_id, 'yenile')
+    
+    report['sure'] = round(time.perf_counter() - started, 3)
+    report['satir_per_saniye'] = round(report['toplam'] / report['sure'], 1) if report['sure'] else None
+    return report
+
+def apply_stock_movements(user_id, hareketler, negatif_stok=False, neden='hareket', chunk_size=500):
+    """Apply {barkod, delta} movements as set-based increments (caller commits).
+
+    Deltas for the same barcode are summed, then each chunk is one
+    UPDATE ... SET stok_adedi = stok_adedi + CASE barkod ... END RETURNING,
+    so concurrent movements never lose updates. Unless negatif_stok is set,
+    rows that would go below zero are left untouched. Returns one result
+    per barcode in first-seen order.
+    """
+    net = {}
+    for hareket in hareketler:
+        net[hareket['barkod']] = net.get(hareket['barkod'], 0) + hareket['delta']
+    
+    sonuclar = {barkod: {'barkod': barkod, 'id': None, 'delta': delta, 'durum': 'bulunamadi', 'stok_adedi': None}
+                for barkod, delta in net.items()}
+    changes = []
+    uyari_adaylari = []
+    now = datetime.utcnow()
+    items = list(net.items())
+    
+    for i in range(0, len(items), chunk_size):
+        chunk = dict(items[i:i + chunk_size])
+        delta = db.case(chunk, value=Urun.barkod, else_=0)
+        
+        stmt = db.update(Urun).where(Urun.user_id == user_id, Urun.barkod.in_(list(chunk)))
+        if not negatif_stok:
+            stmt = stmt.where(Urun.stok_adedi + delta >= 0)
+        stmt = stmt.values(stok_adedi=Urun.stok_adedi + delta, guncelleme_tarihi=now).returning(
+            Urun.id, Urun.barkod, Urun.stok_adedi, Urun.birim_fiyat, Urun.kategori,
+            Urun.min_stok_seviyesi, Urun.max_stok_seviyesi
+        )
+        
+        for row in db.session.execute(stmt, execution_options={'synchronize_session': False}):
+            sonuclar[row.barkod].update(id=row.id, durum='uygulandi', stok_adedi=row.stok_adedi)
+            onceki = row.stok_adedi - chunk[row.barkod]
+            changes.append(tuple(
+                {'kategori': row.kategori, 'toplam_deger': stok * row.birim_fiyat,
+                 'stok_durumu': stok_durumu_hesapla(stok, row.min_stok_seviyesi, row.max_stok_seviyesi)}
+                for stok in (onceki, row.stok_adedi)
+            ))
+            uyari_adaylari.append((row.id, row.barkod, row.stok_adedi, row.min_stok_seviyesi, row.max_stok_seviyesi))
+        
+        # Existing rows the negative-stock guard refused
+        if not negatif_stok:
+            kalan = [barkod for barkod in chunk if sonuclar[barkod]['durum'] == 'bulunamadi']
+            if kalan:
+                for urun_id, barkod, stok in db.session.query(Urun.id, Urun.barkod, Urun.stok_adedi).filter(
+                        Urun.user_id == user_id, Urun.barkod.in_(kalan)):
+                    sonuclar[barkod].update(id=urun_id, durum='yetersiz_stok', stok_adedi=stok)
+    
+    stat_deltas = update_category_stats(user_id, changes=changes)
+    record_stock_movements(user_id, [
+        (sonuc['id'], sonuc['barkod'], sonuc['delta'])
+        for sonuc in sonuclar.values() if sonuc['durum'] == 'uygulandi'
+    ], neden, now)
+    evaluate_stock_alerts(user_id, uyari_adaylari, now)
+    if changes:
+        if len(uyari_adaylari) > live_updates.MAX_DELTAS:
+            queue_live_update(user_id, 'yenile')
+        else:
+            for urun_id, barkod, stok, min_stok, max_stok in uyari_adaylari:
+                queue_live_update(user_id, 'stok', {
+                    'id': urun_id, 'barkod': barkod, 'stok_adedi': stok,
+                    'stok_durumu': stok_durumu_hesapla(stok, min_stok, max_stok)
+                })
+        queue_live_stats(user_id, stat_deltas)
+        bump_data_version(user_id, now)
+    return list(sonuclar.values())
+
+def record_stock_movements(user_id, hareketler, neden, zaman=None):
+    """Append (product_id, barkod, miktar) entries to the ledger (caller commits)"""
+    zaman = zaman or datetime.utcnow()
+    rows = [
+        {'user_id': user_id, 'product_id': product_id, 'barkod': barkod,
+         'miktar': miktar, 'neden': neden, 'zaman': zaman}
+        for product_id, barkod, miktar in hareketler if miktar
+    ]
+    if rows:
+        db.session.execute(db.insert(StokHareketi), rows)
+
+def evaluate_stock_alerts(user_id, urunler, zaman=None):
+    """Raise, re-level or clear alerts for products whose stock just changed (caller commits).
+
+    urunler holds (product_id, barkod, stok_adedi, min_stok_seviyesi, max_stok_seviyesi),
+    with stok_adedi None for deleted products. Only transitions write rows.
+    """
+    urunler = list(urunler)
+    if not urunler:
+        return
+    zaman = zaman or datetime.utcnow()
+    acik = {
+        uyari.product_id: uyari
+        for uyari in StokUyarisi.query.filter(
+            StokUyarisi.user_id == user_id,
+            StokUyarisi.product_id.in_([u[0] for u in urunler]),
+            StokUyarisi.durum != 'kapandi'
+        )
+    }
+    
+    olaylar = []
+    for product_id, barkod, stok, min_stok, max_stok in urunler:
+        seviye = None
+        if stok is not None:
+            durum = stok_durumu_hesapla(stok, min_stok, max_stok)
+            seviye = durum if durum in ('kritik', 'dusuk') else None
+        uyari = acik.get(product_id)
+        
+        if uyari is None:
+            if seviye is None:
+                continue
+            uyari = StokUyarisi(user_id=user_id, product_id=product_id, barkod=barkod, seviye=seviye,
+                                durum='acik', stok_adedi=stok, acilma_zamani=zaman)
+            db.session.add(uyari)
+            olay = 'acildi'
+        elif seviye is None:
+            uyari.durum, uyari.kapanma_zamani = 'kapandi', zaman
+            olay = 'kapandi'
+        elif seviye != uyari.seviye:
+            # Escalation to kritik needs acknowledging again
+            if seviye == 'kritik':
+                uyari.durum, uyari.onay_zamani = 'acik', None
+            uyari.seviye = seviye
+            olay = 'seviye_degisti'
+        else:
+            uyari.stok_adedi = stok
+            continue
+        
+        uyari.barkod = barkod
+        if stok is not None:
+            uyari.stok_adedi = stok
+        olaylar.append((uyari, olay))
+    
+    if olaylar:
+        db.session.flush()
+        db.session.execute(db.insert(StokUyariOlayi), [
+            {'user_id': user_id, 'uyari_id': uyari.id, 'product_id': uyari.product_id, 'barkod': uyari.barkod,
+             'olay': olay, 'seviye': uyari.seviye, 'stok_adedi': uyari.stok_adedi, 'zaman': zaman}
+            for uyari, olay in olaylar
+        ])
+        if len(olaylar) > live_updates.MAX_DELTAS:
+            queue_live_update(user_id, 'yenile')
+        else:
+            for uyari, olay in olaylar:
+                queue_live_update(user_id, 'uyari', {**uyari.to_dict(), 'olay': olay})
+
+def acknowledge_stock_alert(user_id, uyari_id):
+    """Mark an open alert as seen (caller commits); None if it isn't open"""
+    uyari = StokUyarisi.query.filter_by(id=uyari_id, user_id=user_id, durum='acik').first()
+    if uyari is None:
+        return None
+    uyari.durum, uyari.onay_zamani = 'onaylandi', datetime.utcnow()
+    db.session.add(StokUyariOlayi(user_id=user_id, uyari_id=uyari.id, product_id=uyari.product_id,
+                                  barkod=uyari.barkod, olay='onaylandi', seviye=uyari.seviye,
+                                  stok_adedi=uyari.stok_adedi, zaman=uyari.onay_zamani))
+    queue_live_update(user_id, 'uyari', {**uyari.to_dict(), 'olay': 'onaylandi'})
+    return uyari
+
+def rebuild_stock_alerts(user_id):
+    """Bring a user's alerts in line with current stock (backfill for existing data)"""
+    last_id = 0
+    while True:
+        rows = db.session.query(Urun.id, Urun.barkod, Urun.stok_adedi, Urun.min_stok_seviyesi,
+                                Urun.max_stok_seviyesi).filter(Urun.user_id == user_id, Urun.id > last_id)\
+            .order_by(Urun.id).limit(500).all()
+        if not rows:
+            break
+        evaluate_stock_alerts(user_id, rows)
+        db.session.commit()
+        last_id = rows[-1][0]
+
+    # Alerts for products that no longer exist
+    yetim = db.session.query(StokUyarisi.product_id, StokUyarisi.barkod)\
+        .outerjoin(Urun, Urun.id == StokUyarisi.product_id)\
+        .filter(StokUyarisi.user_id == user_id, StokUyarisi.durum != 'kapandi', Urun.id.is_(None)).all()
+    evaluate_stock_alerts(user_id, [(pid, barkod, None, None, None) for pid, barkod in yetim])
+    db.session.commit()
+
+def take_stock_snapshot(user_id=None, zaman=None):
+    """Copy current stock levels into stock_snapshots with one INSERT ... SELECT"""
+    zaman = zaman or datetime.utcnow()
+    select = db.select(Urun.user_id, Urun.id, Urun.barkod, Urun.stok_adedi, db.literal(zaman))
+    if user_id is not None:
+        select = select.where(Urun.user_id == user_id)
+    result = db.session.execute(db.insert(StokSnapshot).from_select(
+        ['user_id', 'product_id', 'barkod', 'stok_adedi', 'zaman'], select))
+    db.session.commit()
+    return result.rowcount
+
+def seed_opening_snapshots(conn):
+    """Opening snapshot for products whose stock the ledger doesn't explain (they predate it).
+
+    Stock minus all recorded movements is taken as the level since the product
+    was created. Products with a snapshot or a fully explained stock are skipped,
+    so this is idempotent and cheap once seeded. Returns the number of rows.
+    """
+    hareket_toplami = db.select(db.func.coalesce(db.func.sum(StokHareketi.miktar), 0)).where(
+        StokHareketi.user_id == Urun.user_id, StokHareketi.product_id == Urun.id).scalar_subquery()
+    snapshot_var = db.select(StokSnapshot.id).where(
+        StokSnapshot.user_id == Urun.user_id, StokSnapshot.product_id == Urun.id).exists()
+    select = db.select(
+        Urun.user_id, Urun.id, Urun.barkod, Urun.stok_adedi - hareket_toplami,
+        db.func.coalesce(Urun.olusturma_tarihi, datetime.utcnow())
+    ).where(~snapshot_var, Urun.stok_adedi != hareket_toplami)
+    return conn.execute(db.insert(StokSnapshot).from_select(
+        ['user_id', 'product_id', 'barkod', 'stok_adedi', 'zaman'], select)).rowcount
+
+def stock_at(user_id, zaman, barkod=None):
+    """{product_id: (barkod, stok)} at a point in time: nearest snapshot plus later ledger entries"""
+    son_snapshot = db.select(
+        StokSnapshot.product_id, db.func.max(StokSnapshot.zaman).label('zaman')
+    ).where(StokSnapshot.user_id == user_id, StokSnapshot.zaman <= zaman)
+    if barkod:
+        son_snapshot = son_snapshot.where(StokSnapshot.barkod == barkod)
+    son_snapshot = son_snapshot.group_by(StokSnapshot.product_id).subquery()
+    
+    stoklar = {}
+    for product_id, snap_barkod, stok, snap_zaman in db.session.query(
+            StokSnapshot.product_id, StokSnapshot.barkod, StokSnapshot.stok_adedi, StokSnapshot.zaman
+    ).join(son_snapshot, db.and_(StokSnapshot.product_id == son_snapshot.c.product_id,
+                                 StokSnapshot.zaman == son_snapshot.c.zaman)
+    ).filter(StokSnapshot.user_id == user_id):
+        stoklar[product_id] = (snap_barkod, stok)
+    
+    # Bounded delta scan: only movements after each product's snapshot
+    hareketler = db.session.query(
+        StokHareketi.product_id, db.func.max(StokHareketi.barkod), db.func.sum(StokHareketi.miktar)
+    ).outerjoin(son_snapshot, StokHareketi.product_id == son_snapshot.c.product_id).filter(
+        StokHareketi.user_id == user_id,
+        StokHareketi.zaman <= zaman,
+        db.or_(son_snapshot.c.zaman.is_(None), StokHareketi.zaman > son_snapshot.c.zaman)
+    )
+    if barkod:
+        hareketler = hareketler.filter(StokHareketi.barkod == barkod)
+    for product_id, hareket_barkod, toplam in hareketler.group_by(StokHareketi.product_id):
+        onceki_barkod, stok = stoklar.get(product_id, (hareket_barkod, 0))
+        stoklar[product_id] = (onceki_barkod, stok + toplam)
+    return stoklar
+
+def movement_report(user_id, baslangic, bitis, barkod=None):
+    """Opening/closing stock and in/out totals per product for a date range"""
+    acilis = stock_at(user_id, baslangic, barkod)
+    query = db.session.query(
+        StokHareketi.product_id,
+        db.func.max(StokHareketi.barkod),
+        db.func.coalesce(db.func.sum(db.case((StokHareketi.miktar > 0, StokHareketi.miktar), else_=0)), 0),
+        db.func.coalesce(db.func.sum(db.case((StokHareketi.miktar < 0, StokHareketi.miktar), else_=0)), 0),
+        db.func.count(StokHareketi.id)
+    ).filter(
+        StokHareketi.user_id == user_id,
+        StokHareketi.zaman > baslangic,
+        StokHareketi.zaman <= bitis
+    )
+    if barkod:
+        query = query.filter(StokHareketi.barkod == barkod)
+    
+    rapor = {}
+    for product_id, hareket_barkod, giris, cikis, adet in query.group_by(StokHareketi.product_id):
+        acilis_barkod, acilis_stok = acilis.get(product_id, (hareket_barkod, 0))
+        rapor[product_id] = {
+            'product_id': product_id, 'barkod': acilis_barkod, 'acilis': acilis_stok,
+            'giris': giris, 'cikis': -cikis, 'hareket_sayisi': adet, 'kapanis': acilis_stok + giris + cikis
+        }
+    for product_id, (acilis_barkod, acilis_stok) in acilis.items():
+        if product_id not in rapor and acilis_stok:
+            rapor[product_id] = {
+                'product_id': product_id, 'barkod': acilis_barkod, 'acilis': acilis_stok,
+                'giris': 0, 'cikis': 0, 'hareket_sayisi': 0, 'kapanis': acilis_stok
+            }
+    return sorted(rapor.values(), key=lambda r: r['product_id'])
+
+def _category_aggregate_rows(user_id):
+    """(kategori, count, value, low, critical) per category, computed in SQL"""
+    dusuk_kosulu = Urun.stok_durumu_filtresi('kritik', 'dusuk')
+    return db.session.query(
+        Urun.kategori,
+        db.func.count(Urun.id),
+        db.func.coalesce(db.func.sum(Urun.stok_adedi * Urun.birim_fiyat), 0.0),
+        db.func.coalesce(db.func.sum(db.case((dusuk_kosulu, 1), else_=0)), 0),
+        db.func.coalesce(db.func.sum(db.case((Urun.stok_durumu_filtresi('kritik'), 1), else_=0)), 0)
+    ).filter(Urun.user_id == user_id).group_by(Urun.kategori).all()
+
+class InventorySnapshot:
+    """Columnar copy of one user's products: a NumPy array per column, one row per product.
+
+    Tagged with the data version it was read at. Missing min/max levels are
+    NaN, so comparisons against them are false just like NULL in SQL.
+    """
+    
+    def __init__(self, surum, ids, stok, fiyat, min_stok, max_stok, kategori_kodu, kategoriler):
+        self.surum = surum
+        self.ids = ids
+        self.stok = stok
+        self.fiyat = fiyat
+        self.min_stok = min_stok
+        self.max_stok = max_stok
+        self.kategori_kodu = kategori_kodu
+        self.kategoriler = kategoriler
+        self.degerler = stok * fiyat
+        self._maskeler = None
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def durum_maskeleri(self):
+        """Boolean mask per stock status, with the rules of stok_durumu_hesapla"""
+        if self._maskeler is None:
+            kritik = self.stok == 0
+            dusuk = ~kritik & (self.stok <= self.min_stok)
+            fazla = ~kritik & ~dusuk & (self.stok >= self.max_stok)
+            self._maskeler = {'kritik': kritik, 'dusuk': dusuk, 'fazla': fazla,
+                              'normal': ~(kritik | dusuk | fazla)}
+        return self._maskeler
+    
+    def category_rows(self):
+        """(kategori, count, value, low, critical) per category, like _category_aggregate_rows"""
+        import numpy as np
+        n = len(self.kategoriler)
+        maskeler = self.durum_maskeleri()
+        sayilar = np.bincount(self.kategori_kodu, minlength=n)
+        degerler = np.bincount(self.kategori_kodu, weights=self.degerler, minlength=n)
+        dusuk = np.bincount(self.kategori_kodu, weights=maskeler['kritik'] | maskeler['dusuk'], minlength=n)
+        kritik = np.bincount(self.kategori_kodu, weights=maskeler['kritik'], minlength=n)
+        return [(kategori, int(sayilar[i]), float(degerler[i]), int(dusuk[i]), int(kritik[i]))
+                for i, kategori in enumerate(self.kategoriler) if sayilar[i]]
+    
+    def analysis(self, en_degerli=10):
+        """Valuation, status counts, category breakdown and stock/value distributions"""
+        import numpy as np
+        yuzdelikler = [10, 25, 50, 75, 90, 99]
+        
+        def dagilim(values):
+            if not len(values):
+                return None
+            return {
+                'ortalama': float(values.mean()),
+                'en_az': float(values.min()),
+                'en_cok': float(values.max()),
+                'yuzdelikler': dict(zip((f'p{p}' for p in yuzdelikler),
+                                        (float(v) for v in np.percentile(values, yuzdelikler))))
+            }
+        
+        k = min(en_degerli, len(self))
+        en_iyi = np.argpartition(self.degerler, -k)[-k:] if k else np.array([], dtype=np.int64)
+        en_iyi = en_iyi[np.argsort(self.degerler[en_iyi])[::-1]]
+        return {
+            'urun_sayisi': len(self),
+            'toplam_deger': float(self.degerler.sum()),
+            'toplam_stok': int(self.stok.sum()),
+            'durumlar': {durum: int(mask.sum()) for durum, mask in self.durum_maskeleri().items()},
+            'kategoriler': [
+                {'kategori': kategori, 'urun_sayisi': count, 'toplam_deger': value,
+                 'dusuk_stok': dusuk, 'kritik_stok': kritik}
+                for kategori, count, value, dusuk, kritik in self.category_rows()
+            ],
+            'stok_dagilimi': dagilim(self.stok),
+            'deger_dagilimi': dagilim(self.degerler),
+            'en_degerli': [{'id': int(self.ids[i]), 'toplam_deger': float(self.degerler[i])} for i in en_iyi]
+        }
+
+def build_inventory_snapshot(user_id, surum, chunk_size=50000):
+    """Read the user's products into an InventorySnapshot with one streamed projection query"""
+    import numpy as np
+    # Core result on the session's connection: no ORM row processing for a million rows
+    result = db.session.connection(bind_arguments={'mapper': Urun}).execution_options(stream_results=True).execute(
+        db.select(Urun.id, Urun.stok_adedi, Urun.birim_fiyat, Urun.min_stok_seviyesi,
+                  Urun.max_stok_seviyesi, Urun.kategori)
+        .where(Urun.user_id == user_id)
+    )
+    kodlar = {}
+    sutunlar = [[] for _ in range(6)]
+    tipler = (np.int64, np.int32, np.float64, np.float64, np.float64, np.int32)
+    for chunk in result.partitions(chunk_size):
+        degerler = list(zip(*chunk))
+        # float64 turns NULL min/max levels into NaN
+        for sutun, values, tip in zip(sutunlar[:5], degerler, tipler):
+            sutun.append(np.array(values, dtype=tip))
+        sutunlar[5].append(np.fromiter((kodlar.setdefault(k, len(kodlar)) for k in degerler[5]),
+                                       dtype=np.int32, count=len(chunk)))
+    
+    ids, stok, fiyat, min_stok, max_stok, kodu = (
+        np.concatenate(sutun) if sutun else np.empty(0, dtype=tip) for sutun, tip in zip(sutunlar, tipler)
+    )
+    return InventorySnapshot(surum, ids, stok, fiyat, min_stok, max_stok, kodu, list(kodlar))
+
+_snapshot_build_lock = threading.Lock()
+
+def inventory_snapshot(user_id):
+    """The user's snapshot at the current data version; rebuilt only after a write"""
+    surum = data_version(user_id)[0]
+    snapshot = inventory_snapshot_cache.get(user_id)
+    if snapshot is not None and snapshot.surum == surum:
+        return snapshot
+    # Rows this request wrote aren't committed yet, so they must not be cached under a version
+    if g.get('db_wrote'):
+        return build_inventory_snapshot(user_id, surum)
+    
+    # One build at a time per process: concurrent requests for a stale snapshot wait for it
+    with _snapshot_build_lock:
+        snapshot = inventory_snapshot_cache.get(user_id)
+        if snapshot is None or snapshot.surum != surum:
+            snapshot = build_inventory_snapshot(user_id, surum)
+            inventory_snapshot_cache.set(user_id, snapshot)
+        return snapshot
+
+class StockAnalysisState:
+    """Daily consumption per product folded from the stock ledger, extended by ledger id.
+
+    Consumption is every negative ledger entry except opening stock, imports
+    (recounts) and deletions. It is kept as (product, day, quantity) arrays
+    with one row per product-day inside the analysis window, plus the first
+    ledger day of every product for products younger than the window.
+    """
+    
+    TUKETIM_DISI = ('ilk_stok', 'ice_aktarma', 'silme')
+    
+    def __init__(self):
+        import numpy as np
+        self.lock = threading.Lock()
+        self.son_id = 0
+        self.urun = np.empty(0, dtype=np.int64)
+        self.gun = np.empty(0, dtype=np.int64)
+        self.miktar = np.empty(0, dtype=np.float64)
+        self.ilk_urun = np.empty(0, dtype=np.int64)
+        self.ilk_gun = np.empty(0, dtype=np.int64)
+        self.sonuc = None
+    
+    def refresh(self, user_id, en_eski_gun, chunk_size=50000):
+        """Fold ledger rows after son_id into the state, chunk by chunk"""
+        import numpy as np
+        # Same settle delay as the alert feed: a slower transaction may still commit a smaller id
+        sinir = datetime.utcnow() - timedelta(seconds=current_app.config['STOCK_ALERT_FEED_DELAY'])
+        with self.lock:
+            while True:
+                rows = db.session.connection(bind_arguments={'mapper': StokHareketi}).execute(
+                    db.select(StokHareketi.id, StokHareketi.product_id, StokHareketi.miktar,
+                              StokHareketi.neden, StokHareketi.zaman)
+                    .where(StokHareketi.user_id == user_id, StokHareketi.id > self.son_id)
+                    .order_by(StokHareketi.id).limit(chunk_size)
+                ).all()
+                urun, gun, miktar, tum_urun, tum_gun = [], [], [], [], []
+                taze = False
+                for hareket_id, product_id, adet, neden, zaman in rows:
+                    if zaman > sinir:
+                        taze = True
+                        break
+                    gun_no = zaman.toordinal()
+                    tum_urun.append(product_id)
+                    tum_gun.append(gun_no)
+                    if adet < 0 and neden not in self.TUKETIM_DISI:
+                        urun.append(product_id)
+                        gun.append(gun_no)
+                        miktar.append(-adet)
+                    self.son_id = hareket_id
+                
+                self.urun = np.concatenate([self.urun, np.array(urun, dtype=np.int64)])
+                self.gun = np.concatenate([self.gun, np.array(gun, dtype=np.int64)])
+                self.miktar = np.concatenate([self.miktar, np.array(miktar, dtype=np.float64)])
+                self._merge_first_days(np.array(tum_urun, dtype=np.int64), np.array(tum_gun, dtype=np.int64))
+                if taze or len(rows) < chunk_size:
+                    break
+            self._compact(en_eski_gun)
+    
+    def _merge_first_days(self, urun, gun):
+        import numpy as np
+        if not len(urun):
+            return
+        urun = np.concatenate([self.ilk_urun, urun])
+        gun = np.concatenate([self.ilk_gun, gun])
+        sira = np.lexsort((gun, urun))
+        self.ilk_urun, ilk = np.unique(urun[sira], return_index=True)
+        self.ilk_gun = gun[sira][ilk]
+    
+    def _compact(self, en_eski_gun):
+        """One row per product-day, days before the window dropped"""
+        import numpy as np
+        pencerede = self.gun >= en_eski_gun
+        anahtar = (self.urun[pencerede] << 32) | self.gun[pencerede]
+        anahtarlar, ters = np.unique(anahtar, return_inverse=True)
+        self.miktar = np.bincount(ters, weights=self.miktar[pencerede], minlength=len(anahtarlar))
+        self.urun = anahtarlar >> 32
+        self.gun = anahtarlar & 0xFFFFFFFF
+
+_stock_analysis_lock = threading.Lock()
+
+def stock_analysis_state(user_id):
+    with _stock_analysis_lock:
+        state = stock_analysis_cache.get(user_id)
+        if state is None:
+            state = StockAnalysisState()
+            stock_analysis_cache.set(user_id, state)
+        return state
+
+def stock_analysis(user_id, teslim_suresi=7, hizmet_seviyesi=0.95):
+    """Consumption rate, reorder point, days until stockout and ABC class per product.
+
+    Arrays are aligned with the user's InventorySnapshot. Daily consumption
+    over STOCK_ANALYSIS_WINDOW_DAYS (or the product's life, if shorter) gives
+    the rate and its deviation; the reorder point covers the lead time plus
+    safety stock for the service level. ABC splits the yearly consumption
+    value at 80% / 95%. Returns (snapshot, result), cached until the data,
+    the ledger, the parameters or the day change.
+    """
+    import numpy as np
+    pencere = current_app.config['STOCK_ANALYSIS_WINDOW_DAYS']
+    bugun = datetime.utcnow().toordinal()
+    snapshot = inventory_snapshot(user_id)
+    state = stock_analysis_state(user_id)
+    state.refresh(user_id, bugun - pencere + 1)
+    
+    anahtar = (snapshot.surum, state.son_id, teslim_suresi, hizmet_seviyesi, bugun)
+    sonuc = state.sonuc
+    if sonuc is not None and sonuc[0] == anahtar:
+        return snapshot, sonuc[1]
+    
+    n = len(snapshot)
+    sira = np.argsort(snapshot.ids)
+    sirali = snapshot.ids[sira]
+    
+    def konumlar(ids):
+        # Snapshot positions of ledger product ids; deleted products drop out
+        if not n:
+            return np.empty(0, dtype=np.int64), np.zeros(len(ids), dtype=bool)
+        pos = np.minimum(np.searchsorted(sirali, ids), n - 1)
+        bulunan = sirali[pos] == ids
+        return sira[pos[bulunan]], bulunan
+    
+    pencerede = state.gun >= bugun - pencere + 1
+    konum, bulunan = konumlar(state.urun[pencerede])
+    miktar = state.miktar[pencerede][bulunan]
+    toplam = np.bincount(konum, weights=miktar, minlength=n)
+    kareler = np.bincount(konum, weights=miktar ** 2, minlength=n)
+    
+    gunler = np.full(n, float(pencere))
+    konum, bulunan = konumlar(state.ilk_urun)
+    gunler[konum] = np.clip(bugun - state.ilk_gun[bulunan] + 1, 1, pencere)
+    
+    hiz = toplam / gunler
+    sapma = np.sqrt(np.maximum(kareler / gunler - hiz ** 2, 0))
+    guvenlik_stogu = NormalDist().inv_cdf(hizmet_seviyesi) * sapma * np.sqrt(teslim_suresi)
+    siparis_noktasi = np.ceil(hiz * teslim_suresi + guvenlik_stogu)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kalan_gun = np.where(hiz > 0, np.maximum(snapshot.stok, 0) / hiz, np.inf)
+    siparis_gerekli = (hiz > 0) & (snapshot.stok <= siparis_noktasi)
+    
+    yillik_deger = hiz * 365 * snapshot.fiyat
+    sinif = np.full(n, 2, dtype=np.int8)
+    toplam_deger = float(yillik_deger.sum())
+    if toplam_deger > 0:
+        # A while the share before the product is under 80%, B under 95%, else C
+        sirada = np.argsort(-yillik_deger, kind='stable')
+        onceki_pay = (np.cumsum(yillik_deger[sirada]) - yillik_deger[sirada]) / toplam_deger
+        sinif[sirada] = np.where(onceki_pay < 0.8, 0, np.where(onceki_pay < 0.95, 1, 2))
+        sinif[yillik_deger <= 0] = 2
+    
+    ozet = {
+        'urun_sayisi': n,
+        'siparis_gereken': int(siparis_gerekli.sum()),
+        'tukenen': int((snapshot.stok <= 0).sum()),
+        'yillik_tuketim_degeri': toplam_deger,
+        'siniflar': {
+            harf: {'urun_sayisi': int((sinif == i).sum()), 'yillik_deger': float(yillik_deger[sinif == i].sum())}
+            for i, harf in enumerate('ABC')
+        },
+        'pencere_gun': pencere,
+        'son_hareket_id': state.son_id
+    }
+    sonuc = {
+        'hiz': hiz, 'sapma': sapma, 'guvenlik_stogu': guvenlik_stogu, 'siparis_noktasi': siparis_noktasi,
+        'kalan_gun': kalan_gun, 'siparis_gerekli': siparis_gerekli, 'yillik_deger': yillik_deger,
+        'sinif': sinif, 'ozet': ozet
+    }
+    state.sonuc = (anahtar, sonuc)
+    return snapshot, sonuc
+
+def rebuild_category_stats(user_id):
+    """Recompute a user's stats table rows from the products table"""
+    CategoryStat.query.filter_by(user_id=user_id).delete()
+    rows = _category_aggregate_rows(user_id)
+    for kategori, count, value, dusuk, kritik in rows:
+        db.session.add(CategoryStat(
+            user_id=user_id,
+            kategori=kategori,
+            urun_sayisi=count,
+            toplam_deger=value,
+            dusuk_stok_sayisi=dusuk,
+            kritik_stok_sayisi=kritik
+        ))
+    db.session.commit()
+    return rows
+
+def update_category_stats(user_id, old=None, new=None, changes=None):
+    """Apply product writes to the stats table.
+
+    old/new are to_dict()-style snapshots (kategori, toplam_deger, stok_durumu)
+    of a single product; changes is a list of (old, new) pairs for batches.
+    Runs inside the caller's transaction; the caller commits. Returns the net
+    delta per category, {kategori: [count, value, low, critical]}, which
+    queue_live_stats() sends to live dashboards.
+    """
+    # Net delta per category: [count, value, low, critical]
+    deltas = {}
+    for eski, yeni in (changes or [(old, new)]):
+        for snapshot, sign in ((eski, -1), (yeni, 1)):
+            if snapshot is None:
+                continue
+            delta = deltas.setdefault(snapshot['kategori'], [0, 0.0, 0, 0])
+            delta[0] += sign
+            delta[1] += sign * snapshot['toplam_deger']
+            if snapshot['stok_durumu'] in ['kritik', 'dusuk']:
+                delta[2] += sign
+            if snapshot['stok_durumu'] == 'kritik':
+                delta[3] += sign
+    if not current_app.config['STATS_TABLE_ENABLED']:
+        return deltas
     
-    @property
-    def toplam_deger(self):
-        return self.stok_adedi * self.birim_fiyat
+    upsert = upsert_insert(CategoryStat)
+    for kategori, (count, value, dusuk, kritik) in deltas.items():
+        if upsert is not None:
+            # One statement per category: two writers creating the same category can't collide
+            db.session.execute(upsert.values(
+                user_id=user_id, kategori=kategori, urun_sayisi=count, toplam_deger=value,
+                dusuk_stok_sayisi=dusuk, kritik_stok_sayisi=kritik
+            ).on_conflict_do_update(
+                index_elements=['user_id', 'kategori'],
+                set_={
+                    'urun_sayisi': CategoryStat.urun_sayisi + count,
+                    'toplam_deger': CategoryStat.toplam_deger + value,
+                    'dusuk_stok_sayisi': CategoryStat.dusuk_stok_sayisi + dusuk,
+                    'kritik_stok_sayisi': CategoryStat.kritik_stok_sayisi + kritik
+                }
+            ))
+            continue
+        
+        stat = CategoryStat.query.filter_by(user_id=user_id, kategori=kategori).first()
+        if stat is None:
+            stat = CategoryStat(user_id=user_id, kategori=kategori, urun_sayisi=0,
+                                toplam_deger=0.0, dusuk_stok_sayisi=0, kritik_stok_sayisi=0)
+            db.session.add(stat)
+            db.session.flush()
+        
+        # Increment in SQL so concurrent writers don't overwrite each other
+        stat.urun_sayisi = CategoryStat.urun_sayisi + count
+        stat.toplam_deger = CategoryStat.toplam_deger + value
+        stat.dusuk_stok_sayisi = CategoryStat.dusuk_stok_sayisi + dusuk
+        stat.kritik_stok_sayisi = CategoryStat.kritik_stok_sayisi + kritik
+    return deltas
+
+def bump_data_version(user_id, zaman=None):
+    """Mark the user's product data as changed (caller commits, so readers see it with the write)"""
+    zaman = zaman or datetime.utcnow()
+    stmt = upsert_insert(UserDataVersion)
+    if stmt is not None:
+        stmt = stmt.values(user_id=user_id, surum=1, guncelleme=zaman)
+        surum = db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={'surum': UserDataVersion.surum + 1, 'guncelleme': zaman}
+        ).returning(UserDataVersion.surum)).scalar()
+    else:
+        updated = db.session.execute(
+            db.update(UserDataVersion).where(UserDataVersion.user_id == user_id)
+            .values(surum=UserDataVersion.surum + 1, guncelleme=zaman)
+        ).rowcount
+        if not updated:
+            db.session.add(UserDataVersion(user_id=user_id, surum=1, guncelleme=zaman))
+            db.session.flush()
+        surum = data_version(user_id)[0]
     
-    @property
-    def stok_durumu(self):
-        if self.stok_adedi == 0:
-            return 'kritik'
-        elif self.stok_adedi <= self.min_stok_seviyesi:
-            return 'dusuk'
-        elif self.stok_adedi >= self.max_stok_seviyesi:
-            return 'fazla'
-        return 'normal'
+    # Live updates published with this commit carry the version they lead to
+    db.session.info.setdefault('canli_surumler', {})[user_id] = surum
+
+def data_version(user_id):
+    """(version, last change time) for the user; (0, None) before their first write"""
+    row = db.session.query(UserDataVersion.surum, UserDataVersion.guncelleme)\
+        .filter(UserDataVersion.user_id == user_id).first()
+    return (row.surum, row.guncelleme) if row else (0, None)
+
+def user_data_version(user_id):
+    """Changes whenever the user's products change"""
+    return str(data_version(user_id)[0])
+
+def _copy_tenant_rows(kaynak, hedef, table, user_id, chunk_size, after_id=None, keep_ids=True):
+    """Stream one table's rows of a user from the source engine into the target connection"""
+    query = db.select(table).where(table.c.user_id == user_id).order_by(*table.primary_key.columns)
+    if after_id is not None:
+        query = query.where(table.c.id > after_id)
+    copied = 0
+    with kaynak.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(query)
+        for rows in result.partitions(chunk_size):
+            values = [row._asdict() for row in rows]
+            if not keep_ids:
+                for row in values:
+                    del row['id']
+            hedef.execute(db.insert(table), values)
+            copied += len(values)
+    return copied
+
+def _delete_tenant_rows(engine, user_id, chunk_size):
+    """Delete a user's rows from every tenant table, children first, in short transactions"""
+    for table in reversed(db.metadata.sorted_tables):
+        if table.name in TenantRouter.SHARED_TABLES:
+            continue
+        pk = table.primary_key.columns.values()[0]
+        while True:
+            with engine.begin() as conn:
+                ids = db.select(pk).where(table.c.user_id == user_id).limit(chunk_size).scalar_subquery()
+                if not conn.execute(db.delete(table).where(pk.in_(ids))).rowcount:
+                    break
+
+def move_tenant(user_id, magaza, chunk_size=1000, bekleme=None, log=None):
+    """Move a user's rows to another store (None = primary) and point the tenant map at it.
+
+    The user's writes get 503 while the rows are copied in a single target
+    transaction; a failed copy leaves the user where they were. After the switch,
+    activities the audit buffers still wrote to the old store are copied over
+    and the old rows are deleted. Waits bekleme seconds (default: the map cache
+    TTL + 1) after each map change so every worker has seen it.
+    """
+    log = log or (lambda message: None)
+    bekleme = current_app.config['TENANT_MAP_CACHE_TTL'] + 1 if bekleme is None else bekleme
+    kaynak_magaza, _ = tenant_router.placement(user_id, cached=False)
+    if kaynak_magaza == magaza:
+        return {}
+    kaynak, hedef = tenant_router.engine(kaynak_magaza), tenant_router.engine(magaza)
+    if kaynak.url == hedef.url:
+        raise ValueError(f'{kaynak_magaza or "ana"} ve {magaza or "ana"} aynı veritabanı')
+    tablolar = [table for table in db.metadata.sorted_tables if table.name not in TenantRouter.SHARED_TABLES]
+    db.metadata.create_all(hedef)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'ad': self.ad,
-            'barkod': self.barkod,
-            'stok_adedi': self.stok_adedi,
-            'birim_fiyat': self.birim_fiyat,
-            'kategori': self.kategori,
-            'aciklama': self.aciklama,
-            'toplam_deger': self.toplam_deger,
-            'stok_durumu': self.stok_durumu,
-            'min_stok_seviyesi': self.min_stok_seviyesi,
-            'max_stok_seviyesi': self.max_stok_seviyesi,
-            'olusturma_tarihi': self.olusturma_tarihi.isoformat(),
-            'guncelleme_tarihi': self.guncelleme_tarihi.isoformat()
-        }
+    tenant_router.set_placement(user_id, kaynak_magaza, 'tasiniyor')
+    time.sleep(bekleme)
+    sayilar = {}
+    try:
+        with hedef.begin() as conn:
+            for table in reversed(tablolar):  # leftovers of an earlier, aborted move
+                conn.execute(db.delete(table).where(table.c.user_id == user_id))
+            if magaza is not None and not conn.execute(
+                    db.select(User.id).where(User.id == user_id)).first():
+                # Foreign key anchor; the user itself is always read from the primary
+                with db.engine.connect() as ana:
+                    user_row = ana.execute(db.select(User.__table__).where(User.id == user_id)).one()
+                conn.execute(db.insert(User.__table__), [user_row._asdict()])
+            for table in tablolar:
+                sayilar[table.name] = _copy_tenant_rows(kaynak, conn, table, user_id, chunk_size)
+                log(f'  {table.name}: {sayilar[table.name]}')
+            if hedef.dialect.name == 'postgresql':
+                # Copied ids were explicit; move the sequences past them
+                for table in tablolar:
+                    column = table.autoincrement_column
+                    if column is not None:
+                        conn.execute(db.text(
+                            f"SELECT setval(pg_get_serial_sequence('{table.name}', '{column.name}'), "
+                            f"(SELECT COALESCE(MAX({column.name}), 0) + 1 FROM {table.name}), false)"))
+            son_aktivite = conn.execute(db.select(db.func.max(UserActivity.id))
+                                        .where(UserActivity.user_id == user_id)).scalar() or 0
+    except Exception:
+        tenant_router.set_placement(user_id, kaynak_magaza, 'aktif')
+        raise
     
-    def __repr__(self):
-        return f'<Urun {self.ad}>'
+    tenant_router.set_placement(user_id, magaza, 'aktif')
+    time.sleep(bekleme)
+    with hedef.begin() as conn:
+        gec = _copy_tenant_rows(kaynak, conn, UserActivity.__table__, user_id, chunk_size,
+                                after_id=son_aktivite, keep_ids=False)
+    sayilar['user_activities'] += gec
+    _delete_tenant_rows(kaynak, user_id, chunk_size)
+    if kaynak_magaza is not None:
+        with kaynak.begin() as conn:
+            conn.execute(db.delete(User.__table__).where(User.id == user_id))
+    return sayilar
 
-class UserActivity(db.Model):
-    __tablename__ = 'user_activities'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
-    action = db.Column(db.String(50), nullable=False)  # create, update, delete, login, logout
-    resource_type = db.Column(db.String(50))  # product, user, etc.
-    resource_id = db.Column(db.Integer)
-    details = db.Column(db.JSON)
-    ip_address = db.Column(db.String(45))
-    user_agent = db.Column(db.Text)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+def replica_reads(view):
+    """Serve a read-only view from a replica bind, when any is configured.
+
+    A session that wrote within DB_REPLICA_STICKY_SECONDS keeps reading from
+    the primary so users see their own changes despite replication lag.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        replicas = [key for key in db.engines if key and key.startswith('replica_')]
+        if replicas and session.get('_birincil_sonu', 0) < time.time():
+            g.db_replica = random.choice(replicas)
+        return view(*args, **kwargs)
+    return wrapper
+
+@main.after_app_request
+def stick_to_primary_after_write(response):
+    if g.get('db_wrote') and current_app.config['SQLALCHEMY_BINDS']:
+        session['_birincil_sonu'] = time.time() + current_app.config['DB_REPLICA_STICKY_SECONDS']
+    return response
+
+def csrf_protected(view):
+    """CSRF check for POST routes used outside FlaskForm (form field csrf_token or X-CSRFToken header).
+
+    Requests authenticated with a bearer token carry no cookies a foreign page
+    could ride on, so they are exempt; cookie sessions are not, /api/ or not.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if current_app.config['WTF_CSRF_ENABLED'] and not isinstance(current_user._get_current_object(), TokenUser):
+            try:
+                validate_csrf(request.form.get('csrf_token') or request.headers.get('X-CSRFToken'))
+            except ValidationError:
+                return jsonify({'error': 'CSRF doğrulaması başarısız, sayfayı yenileyip tekrar deneyin'}), 400
+        return view(*args, **kwargs)
+    return wrapper
+
+def conditional_get(view):
+    """ETag for per-user read views, answering 304 from the data version alone.
+
+    The ETag covers the build, the user, the data version and the full query
+    string, so an unchanged page is revalidated with one primary-key lookup
+    and without running the view. Pages with pending flash messages are always rendered.
+    No Last-Modified: its one-second granularity can't tell apart writes
+    within the same second, and the version counter can.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        surum = data_version(current_user.id)[0]
+        g.veri_surumu = surum
+        etag = hashlib.sha1(
+            f"{current_app.config['BUILD_ID']}:{current_user.id}:{surum}:{request.full_path}".encode()).hexdigest()
+        
+        if '_flashes' not in session and request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            response.set_etag(etag)
+            # Browsers may keep the page but must revalidate it on every view
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+        return response
+    return wrapper
+
+def product_count(user_id):
+    """Product total without a COUNT(*) per page: stats table sum, else a TTL-cached count.
+
+    Returns (count, approximate).
+    """
+    if current_app.config['STATS_TABLE_ENABLED']:
+        count = db.session.query(db.func.sum(CategoryStat.urun_sayisi))\
+            .filter(CategoryStat.user_id == user_id).scalar()
+        if count is not None:
+            return int(count), False
     
-    def __repr__(self):
-        return f'<Activity {self.action} by {self.user_id}>'
+    count = product_count_cache.get(user_id, LRUCache._missing)
+    if count is LRUCache._missing:
+        count = db.session.query(db.func.count(Urun.id)).filter(Urun.user_id == user_id).scalar()
+        product_count_cache.set(user_id, count)
+    return count, True
 
-# Flask-Login user loader
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
+def encode_cursor(product):
+    """Opaque page cursor for a product's (guncelleme_tarihi, id) position"""
+    return encode_position(product.guncelleme_tarihi, product.id)
 
-# Enterprise Forms
-class LoginForm(FlaskForm):
-    username = StringField('Kullanıcı Adı', validators=[DataRequired(), Length(min=3, max=80)])
-    password = PasswordField('Şifre', validators=[DataRequired()])
-    submit = SubmitField('Giriş Yap')
+def encode_position(zaman, row_id):
+    """Opaque cursor for any (time, id) position; decode_cursor() reads it back"""
+    raw = f"{zaman.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
 
-class RegisterForm(FlaskForm):
-    username = StringField('Kullanıcı Adı', validators=[DataRequired(), Length(min=3, max=80)])
-    email = StringField('E-posta', validators=[DataRequired(), Email()])
-    first_name = StringField('Ad', validators=[DataRequired(), Length(min=2, max=50)])
-    last_name = StringField('Soyad', validators=[DataRequired(), Length(min=2, max=50)])
-    company = StringField('Şirket', validators=[Length(max=100)])
-    password = PasswordField('Şifre', validators=[DataRequired(), Length(min=6)])
-    password2 = PasswordField('Şifre Tekrar', validators=[DataRequired(), EqualTo('password')])
-    submit = SubmitField('Kayıt Ol')
+def decode_cursor(cursor):
+    """(guncelleme_tarihi, id) from encode_cursor(); ValueError on tampered input"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        tarih, product_id = raw.split('|')
+        return datetime.fromisoformat(tarih), int(product_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError('invalid cursor')
 
-class ProductForm(FlaskForm):
-    ad = StringField('Ürün Adı', validators=[DataRequired(), Length(min=2, max=100)])
-    barkod = StringField('Barkod', validators=[DataRequired(), Length(min=1, max=50)])
-    stok_adedi = IntegerField('Stok Adedi', validators=[DataRequired(), NumberRange(min=0)])
-    birim_fiyat = FloatField('Birim Fiyat (₺)', validators=[DataRequired(), NumberRange(min=0)])
-    kategori = SelectField('Kategori', choices=[
-        ('Genel', 'Genel'),
-        ('Elektronik', 'Elektronik'),
-        ('Gıda', 'Gıda'),
-        ('Giyim', 'Giyim'),
-        ('Ev & Yaşam', 'Ev & Yaşam'),
-        ('Spor', 'Spor'),
-        ('Kitap', 'Kitap'),
-        ('Oyuncak', 'Oyuncak'),
-        ('Diğer', 'Diğer')
-    ], default='Genel')
-    min_stok_seviyesi = IntegerField('Minimum Stok Seviyesi', validators=[NumberRange(min=0)], default=10)
-    max_stok_seviyesi = IntegerField('Maksimum Stok Seviyesi', validators=[NumberRange(min=1)], default=1000)
-    aciklama = TextAreaField('Açıklama', validators=[Length(max=500)])
-    submit = SubmitField('Kaydet')
+def keyset_page(query, per_page, after=None, before=None):
+    """One page of query, newest (guncelleme_tarihi, id) first, seeking past a cursor.
 
-# Utility Functions
-def log_user_activity(action, resource_type=None, resource_id=None, details=None):
-    """Log user activity for audit trail"""
-    if current_user.is_authenticated:
-        activity = UserActivity(
-            user_id=current_user.id,
-            action=action,
-            resource_type=resource_type,
-            resource_id=resource_id,
-            details=details,
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent')
-        )
-        db.session.add(activity)
-        db.session.commit()
+    Uses the (user_id, guncelleme_tarihi, id) index instead of OFFSET, so every
+    page costs the same. Returns (items, next_cursor, prev_cursor).
+    """
+    position = db.tuple_(Urun.guncelleme_tarihi, Urun.id)
+    if before is not None:
+        # Walk backwards from the cursor, then restore display order
+        rows = query.filter(position > db.tuple_(*before))\
+            .order_by(Urun.guncelleme_tarihi.asc(), Urun.id.asc())\
+            .limit(per_page + 1).all()
+        has_prev, has_next = len(rows) > per_page, True
+        items = rows[:per_page][::-1]
+    else:
+        if after is not None:
+            query = query.filter(position < db.tuple_(*after))
+        rows = query.order_by(Urun.guncelleme_tarihi.desc(), Urun.id.desc())\
+            .limit(per_page + 1).all()
+        has_prev, has_next = after is not None, len(rows) > per_page
+        items = rows[:per_page]
+    
+    if not items:
+        return items, None, None
+    return (items,
+            encode_cursor(items[-1]) if has_next else None,
+            encode_cursor(items[0]) if has_prev else None)
+
+def get_dashboard_stats(user_id):
+    """Dashboard totals and category breakdown in O(categories)"""
+    if current_app.config['STATS_TABLE_ENABLED']:
+        rows = [(s.kategori, s.urun_sayisi, s.toplam_deger, s.dusuk_stok_sayisi, s.kritik_stok_sayisi)
+                for s in CategoryStat.query.filter_by(user_id=user_id).all()]
+        if not rows:
+            # No products, or not backfilled yet (flask rebuild-stats): aggregate, never write here
+            rows = _category_aggregate_rows(user_id)
+    elif current_app.config['INVENTORY_SNAPSHOT_ENABLED']:
+        rows = inventory_snapshot(user_id).category_rows()
+    else:
+        rows = _category_aggregate_rows(user_id)
+    
+    kategori_stats = {}
+    for kategori, count, value, dusuk, kritik in rows:
+        if count > 0:
+            kategori_stats[kategori] = {'count': count, 'value': value}
+    
+    return {
+        'toplam_urun_sayisi': sum(r[1] for r in rows),
+        'toplam_stok_degeri': sum(r[2] for r in rows),
+        'dusuk_stoklu_urunler': sum(r[3] for r in rows),
+        'kritik_stoklu_urunler': sum(r[4] for r in rows),
+        'kategori_stats': kategori_stats
+    }
+
+def queue_live_stats(user_id, deltas):
+    """Send a write's category deltas from update_category_stats() with the commit.
+
+    Pages add them to the totals they rendered, so a write never runs the
+    dashboard aggregate; nothing is queued while nobody is listening.
+    """
+    kategoriler = {
+        kategori: {'count': count, 'value': value, 'dusuk': dusuk, 'kritik': kritik}
+        for kategori, (count, value, dusuk, kritik) in deltas.items() if count or value or dusuk or kritik
+    }
+    if kategoriler and live_updates.has_subscribers(user_id):
+        queue_live_update(user_id, 'istatistik', {'kategoriler': kategoriler})
 
 # Authentication Routes
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
         
-        if user and user.check_password(form.password.data) and user.is_active:
+        try:
+            dogru = bool(user and user.check_password(form.password.data))
+        except PasswordHasherBusy as exc:
+            flash(exc.description, 'warning')
+            return render_template('auth/login.html', form=form), 503, {'Retry-After': str(exc.retry_after)}
+        
+        if dogru and user.is_active:
             login_user(user, remember=True)
             user.last_login = datetime.utcnow()
             db.session.commit()
@@ -242,16 +3020,16 @@ def login():
             flash(f'Hoş geldiniz, {user.get_full_name()}!', 'success')
             
             next_page = request.args.get('next')
-            return redirect(next_page) if next_page else redirect(url_for('dashboard'))
+            return redirect(next_page) if next_page else redirect(url_for('main.dashboard'))
         else:
             flash('Geçersiz kullanıcı adı veya şifre!', 'danger')
     
     return render_template('auth/login.html', form=form)
 
-@app.route('/register', methods=['GET', 'POST'])
+@main.route('/register', methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     form = RegisterForm()
     if form.validate_on_submit():
@@ -274,61 +3052,48 @@ def register():
                 last_name=form.last_name.data,
                 company=form.company.data
             )
-            user.set_password(form.password.data)
+            try:
+                user.set_password(form.password.data)
+            except PasswordHasherBusy as exc:
+                flash(exc.description, 'warning')
+                return render_template('auth/register.html', form=form), 503, {'Retry-After': str(exc.retry_after)}
             
             db.session.add(user)
             db.session.commit()
             
             log_user_activity('register', 'user', user.id)
             flash('Kayıt başarılı! Şimdi giriş yapabilirsiniz.', 'success')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
     
     return render_template('auth/register.html', form=form)
 
-@app.route('/logout')
+@main.route('/logout')
 @login_required
 def logout():
     log_user_activity('logout')
     logout_user()
     flash('Başarıyla çıkış yaptınız.', 'info')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
 # Dashboard (Ana Sayfa - Login Required)
-@app.route('/dashboard')
-@app.route('/')
+@main.route('/dashboard')
+@main.route('/')
 @login_required
+@replica_reads
+@conditional_get
 def dashboard():
-    # User-specific data
-    user_products = Urun.query.filter_by(user_id=current_user.id).all()
-    
-    # Statistics
-    toplam_urun_sayisi = len(user_products)
-    toplam_stok_degeri = sum(urun.toplam_deger for urun in user_products)
-    dusuk_stoklu_urunler = len([p for p in user_products if p.stok_durumu in ['kritik', 'dusuk']])
-    kritik_stoklu_urunler = len([p for p in user_products if p.stok_durumu == 'kritik'])
-    
-    # Category statistics
-    kategori_stats = {}
-    for urun in user_products:
-        if urun.kategori not in kategori_stats:
-            kategori_stats[urun.kategori] = {'count': 0, 'value': 0}
-        kategori_stats[urun.kategori]['count'] += 1
-        kategori_stats[urun.kategori]['value'] += urun.toplam_deger
-    
-    istatistikler = {
-        'toplam_urun_sayisi': toplam_urun_sayisi,
-        'toplam_stok_degeri': toplam_stok_degeri,
-        'dusuk_stoklu_urunler': dusuk_stoklu_urunler,
-        'kritik_stoklu_urunler': kritik_stoklu_urunler,
-        'kategori_stats': kategori_stats
-    }
+    # Statistics (aggregated in the database)
+    istatistikler = get_dashboard_stats(current_user.id)
     
     # Recent products
     son_urunler = Urun.query.filter_by(user_id=current_user.id)\
         .order_by(Urun.olusturma_tarihi.desc()).limit(5).all()
     
-    # Low stock alerts
-    dusuk_stok_urunler = [p for p in user_products if p.stok_durumu in ['kritik', 'dusuk']][:5]
+    # Low stock alerts not yet acknowledged
+    dusuk_stok_urunler = Urun.query.join(StokUyarisi, StokUyarisi.product_id == Urun.id).filter(
+        StokUyarisi.user_id == current_user.id,
+        StokUyarisi.durum == 'acik'
+    ).order_by(Urun.stok_adedi).limit(5).all()
     
     return render_template('dashboard.html', 
                          istatistikler=istatistikler, 
@@ -336,7 +3101,7 @@ def dashboard():
                          dusuk_stok_urunler=dusuk_stok_urunler)
 
 # Product Management Routes
-@app.route('/urun_ekle', methods=['GET', 'POST'])
+@main.route('/urun_ekle', methods=['GET', 'POST'])
 @login_required
 def urun_ekle():
     form = ProductForm()
@@ -363,7 +3128,18 @@ def urun_ekle():
             )
             
             db.session.add(product)
+            db.session.flush()
+            update_search_index(product)
+            stat_deltas = update_category_stats(current_user.id, new=product.to_dict())
+            record_stock_movements(current_user.id, [(product.id, product.barkod, product.stok_adedi)], 'ilk_stok')
+            evaluate_stock_alerts(current_user.id, [(product.id, product.barkod, product.stok_adedi,
+                                                     product.min_stok_seviyesi, product.max_stok_seviyesi)])
+            queue_live_update(current_user.id, 'urun', {**product.to_dict(), 'yeni': True})
+            queue_live_stats(current_user.id, stat_deltas)
+            bump_data_version(current_user.id)
             db.session.commit()
+            barcode_cache.invalidate((current_user.id, product.barkod))
+            product_count_cache.invalidate(current_user.id)
             
             log_user_activity('create', 'product', product.id, {
                 'product_name': product.ad,
@@ -371,24 +3147,43 @@ def urun_ekle():
             })
             
             flash(f'Ürün "{product.ad}" başarıyla eklendi!', 'success')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
     
     return render_template('urun_ekle.html', form=form)
 
-@app.route('/urun_listesi')
+@main.route('/urun_listesi')
+@main.route('/api/urun_listesi')
 @login_required
+@replica_reads
+@conditional_get
 def urun_listesi():
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
+    per_page = max(1, min(request.args.get('adet', 20, type=int), 100))
+    try:
+        after = decode_cursor(request.args.get('sonraki'))
+        before = decode_cursor(request.args.get('onceki'))
+    except ValueError:
+        if request.path.startswith('/api/'):
+            return jsonify({'error': 'Geçersiz sayfa imleci'}), 400
+        after = before = None  # a mangled link in the browser: show the first page
     
-    # User-specific products with pagination
-    products = Urun.query.filter_by(user_id=current_user.id)\
-        .order_by(Urun.guncelleme_tarihi.desc())\
-        .paginate(page=page, per_page=per_page, error_out=False)
+    # Cursor pagination on (guncelleme_tarihi, id): no OFFSET, no COUNT(*) per page
+    products, sonraki, onceki = keyset_page(
+        Urun.query.filter_by(user_id=current_user.id), per_page, after=after, before=before
+    )
+    toplam, yaklasik = product_count(current_user.id)
     
-    return render_template('urun_listesi.html', products=products)
+    if request.path.startswith('/api/'):
+        return jsonify({
+            'urunler': [p.to_dict() for p in products],
+            'sonraki': sonraki,
+            'onceki': onceki,
+            'toplam': toplam,
+            'toplam_yaklasik': yaklasik
+        })
+    return render_template('urun_listesi.html', products=products, sonraki=sonraki, onceki=onceki,
+                           toplam=toplam, toplam_yaklasik=yaklasik, adet=per_page)
 
-@app.route('/urun_duzenle/<int:id>', methods=['GET', 'POST'])
+@main.route('/urun_duzenle/<int:id>', methods=['GET', 'POST'])
 @login_required
 def urun_duzenle(id):
     product = Urun.query.filter_by(id=id, user_id=current_user.id).first_or_404()
@@ -410,19 +3205,32 @@ def urun_duzenle(id):
             form.populate_obj(product)
             product.guncelleme_tarihi = datetime.utcnow()
             
+            new_data = product.to_dict()
+            
+            update_search_index(product)
+            stat_deltas = update_category_stats(current_user.id, old=old_data, new=new_data)
+            record_stock_movements(current_user.id, [
+                (product.id, product.barkod, product.stok_adedi - old_data['stok_adedi'])
+            ], 'duzenleme')
+            evaluate_stock_alerts(current_user.id, [(product.id, product.barkod, product.stok_adedi,
+                                                     product.min_stok_seviyesi, product.max_stok_seviyesi)])
+            queue_live_update(current_user.id, 'urun', new_data)
+            queue_live_stats(current_user.id, stat_deltas)
+            bump_data_version(current_user.id)
             db.session.commit()
+            barcode_cache.invalidate((current_user.id, old_data['barkod']), (current_user.id, product.barkod))
             
             log_user_activity('update', 'product', product.id, {
                 'old_data': old_data,
-                'new_data': product.to_dict()
+                'new_data': new_data
             })
             
             flash(f'Ürün "{product.ad}" başarıyla güncellendi!', 'success')
-            return redirect(url_for('urun_listesi'))
+            return redirect(url_for('main.urun_listesi'))
     
     return render_template('urun_duzenle.html', form=form, product=product)
 
-@app.route('/urun_sil/<int:id>', methods=['POST'])
+@main.route('/urun_sil/<int:id>', methods=['POST'])
 @login_required
 def urun_sil(id):
     product = Urun.query.filter_by(id=id, user_id=current_user.id).first_or_404()
@@ -432,133 +3240,852 @@ def urun_sil(id):
         'barcode': product.barkod
     })
     
+    stat_deltas = update_category_stats(current_user.id, old=product.to_dict())
+    record_stock_movements(current_user.id, [(product.id, product.barkod, -product.stok_adedi)], 'silme')
+    evaluate_stock_alerts(current_user.id, [(product.id, product.barkod, None, None, None)])
+    bump_data_version(current_user.id)
     db.session.delete(product)
+    queue_live_update(current_user.id, 'urun_silindi', {'id': product.id, 'barkod': product.barkod})
+    queue_live_stats(current_user.id, stat_deltas)
     db.session.commit()
+    barcode_cache.invalidate((current_user.id, product.barkod))
+    product_count_cache.invalidate(current_user.id)
     
     flash(f'Ürün "{product.ad}" başarıyla silindi!', 'success')
-    return redirect(url_for('urun_listesi'))
+    return redirect(url_for('main.urun_listesi'))
 
 # Search and Filter Routes
-@app.route('/ara')
+@main.route('/ara')
 @login_required
+@replica_reads
+@conditional_get
 def ara():
     query = request.args.get('q', '')
     kategori = request.args.get('kategori', '')
     stok_durumu = request.args.get('stok_durumu', '')
+    page = request.args.get('page', 1, type=int)
+    per_page = 50
     
     # Base query for user's products
     products_query = Urun.query.filter_by(user_id=current_user.id)
     
     # Apply filters
     if query:
-        products_query = products_query.filter(
-            (Urun.ad.contains(query)) | 
-            (Urun.barkod.contains(query)) |
-            (Urun.aciklama.contains(query))
-        )
+        products_query = search_products(products_query, current_user.id, query)
     
     if kategori:
         products_query = products_query.filter_by(kategori=kategori)
     
-    products = products_query.order_by(Urun.guncelleme_tarihi.desc()).all()
-    
-    # Filter by stock status (done in Python for complex logic)
     if stok_durumu:
-        products = [p for p in products if p.stok_durumu == stok_durumu]
+        products_query = products_query.filter(Urun.stok_durumu_filtresi(stok_durumu))
+    
+    # Relevance first (when searching), then most recently updated
+    pagination = products_query.order_by(Urun.guncelleme_tarihi.desc())\
+        .paginate(page=page, per_page=per_page, error_out=False)
+    
+    # Summary cards cover every match, not just this page
+    ozet = products_query.with_entities(
+        db.func.coalesce(db.func.sum(Urun.stok_adedi), 0).label('toplam_stok'),
+        db.func.coalesce(db.func.sum(Urun.stok_adedi * Urun.birim_fiyat), 0).label('toplam_deger'),
+        db.func.coalesce(db.func.sum(db.case((Urun.stok_adedi <= 10, 1), else_=0)), 0).label('dusuk_stok')
+    ).order_by(None).one()
     
     return render_template('arama_sonuclari.html', 
-                         products=products, 
-                         query=query,
+                         urunler=pagination.items, 
+                         pagination=pagination,
+                         ozet=ozet,
+                         arama_terimi=query,
                          kategori=kategori,
                          stok_durumu=stok_durumu)
 
-@app.route('/dusuk_stok')
+@main.route('/dusuk_stok')
 @login_required
+@replica_reads
+@conditional_get
 def dusuk_stok():
-    # Get products with low or critical stock
-    products = Urun.query.filter_by(user_id=current_user.id).all()
-    dusuk_stok_products = [p for p in products if p.stok_durumu in ['kritik', 'dusuk']]
+    page = request.args.get('page', 1, type=int)
+    per_page = 50
+    
+    # Products with an open alert: the set maintained at write time, not a scan of products
+    uyarili = Urun.query.join(StokUyarisi, StokUyarisi.product_id == Urun.id).filter(
+        StokUyarisi.user_id == current_user.id,
+        StokUyarisi.durum != 'kapandi'
+    )
+    pagination = uyarili.order_by(Urun.stok_adedi, Urun.id)\
+        .paginate(page=page, per_page=per_page, error_out=False)
+    
+    # Summary cards cover every alerted product, not just this page
+    ozet = uyarili.with_entities(
+        db.func.count(Urun.id).label('toplam'),
+        db.func.sum(db.case((Urun.stok_adedi == 0, 1), else_=0)).label('tukenen'),
+        db.func.sum(db.case(((Urun.stok_adedi > 0) & (Urun.stok_adedi <= 5), 1), else_=0)).label('kritik'),
+        db.func.coalesce(db.func.sum(Urun.stok_adedi * Urun.birim_fiyat), 0).label('kalan_deger')
+    ).order_by(None).one()
+    
+    return render_template('dusuk_stok.html', products=pagination.items, urunler=pagination.items,
+                           pagination=pagination, ozet=ozet)
+
+# Bulk Import Routes
+@main.route('/urun_ice_aktar', methods=['POST'])
+@main.route('/api/urun_ice_aktar', methods=['POST'])
+@login_required
+@csrf_protected
+def urun_ice_aktar():
+    dosya = request.files.get('dosya')
+    if not dosya or not dosya.filename:
+        return jsonify({'error': 'Lütfen bir CSV veya XLSX dosyası seçin'}), 400
+    if not dosya.filename.lower().endswith(('.csv', '.xlsx')):
+        return jsonify({'error': 'Sadece CSV ve XLSX dosyaları desteklenir'}), 400
+    
+    report = import_products(current_user.id, iter_import_rows(dosya.stream, dosya.filename))
+    log_user_activity('import', 'product', None, {
+        key: report[key] for key in ('toplam', 'eklenen', 'guncellenen', 'hatali', 'sure')
+    })
+    return jsonify(report)
+
+# API Authentication
+@main.route('/api/token', methods=['POST'])
+def api_token():
+    data = request.get_json(silent=True) or {}
+    user = User.query.filter_by(username=data.get('username')).first()
+    try:
+        dogru = bool(user and user.is_active and user.check_password(data.get('password') or ''))
+    except PasswordHasherBusy as exc:
+        return jsonify({'error': exc.description}), 503, {'Retry-After': str(exc.retry_after)}
+    if dogru:
+        # Persists a hash upgraded to the current cost
+        db.session.commit()
+        return jsonify({
+            'token': user.generate_jwt_token(),
+            'expires_in': current_app.config['JWT_TOKEN_HOURS'] * 3600
+        })
+    return jsonify({'error': 'Geçersiz kullanıcı adı veya şifre'}), 401
+
+# Stock Movement Routes
+@main.route('/stok_hareketi', methods=['POST'])
+@main.route('/api/stok_hareketi', methods=['POST'])
+@login_required
+def stok_hareketi():
+    data = request.get_json(silent=True) or {}
+    hareketler = data.get('hareketler')
+    if not isinstance(hareketler, list) or not hareketler:
+        return jsonify({'error': 'hareketler boş olmayan bir liste olmalı'}), 400
+    if len(hareketler) > 10000:
+        return jsonify({'error': 'Tek istekte en fazla 10000 hareket gönderilebilir'}), 400
+    for index, hareket in enumerate(hareketler):
+        if not (isinstance(hareket, dict)
+                and isinstance(hareket.get('barkod'), str) and hareket['barkod']
+                and isinstance(hareket.get('delta'), int) and not isinstance(hareket['delta'], bool)):
+            return jsonify({'error': f'Geçersiz hareket (sıra {index}): barkod metin, delta tam sayı olmalı'}), 400
+    
+    neden = data.get('neden', 'hareket')
+    if not isinstance(neden, str) or not 0 < len(neden) <= 30:
+        return jsonify({'error': 'neden en fazla 30 karakterlik bir metin olmalı'}), 400
+    
+    sonuclar = apply_stock_movements(current_user.id, hareketler,
+                                     negatif_stok=bool(data.get('negatif_stok')), neden=neden)
+    uygulanan = [s for s in sonuclar if s['durum'] == 'uygulandi']
+    
+    # All-or-nothing mode: any failed item rolls the whole batch back
+    if data.get('tumu_veya_hicbiri') and len(uygulanan) != len(sonuclar):
+        db.session.rollback()
+        for sonuc in uygulanan:
+            sonuc['durum'] = 'geri_alindi'
+        return jsonify({'uygulanan': 0, 'basarisiz': len(sonuclar) - len(uygulanan), 'sonuclar': sonuclar}), 409
+    
+    db.session.commit()
+    barcode_cache.invalidate(*[(current_user.id, s['barkod']) for s in uygulanan])
+    
+    if uygulanan:
+        log_user_activity('stock_movement', 'product', None, {
+            'hareketler': [[s['id'], s['delta'], s['stok_adedi']] for s in uygulanan]
+        })
+    
+    return jsonify({'uygulanan': len(uygulanan), 'basarisiz': len(sonuclar) - len(uygulanan), 'sonuclar': sonuclar})
+
+# Stock History Routes
+def _tarih_parametresi(name, default=None):
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+@main.route('/api/stok_gecmisi')
+@login_required
+@replica_reads
+def stok_gecmisi():
+    zaman = _tarih_parametresi('tarih', datetime.utcnow())
+    if zaman is None:
+        return jsonify({'error': 'tarih ISO 8601 biçiminde olmalı'}), 400
+    stoklar = stock_at(current_user.id, zaman, request.args.get('barkod'))
+    return jsonify({
+        'tarih': zaman.isoformat(),
+        'urunler': [{'product_id': pid, 'barkod': barkod, 'stok_adedi': stok}
+                    for pid, (barkod, stok) in sorted(stoklar.items())]
+    })
+
+@main.route('/api/stok_hareket_raporu')
+@login_required
+@replica_reads
+def stok_hareket_raporu():
+    bitis = _tarih_parametresi('bitis', datetime.utcnow())
+    baslangic = _tarih_parametresi('baslangic', (bitis or datetime.utcnow()) - timedelta(days=30))
+    if baslangic is None or bitis is None or baslangic > bitis:
+        return jsonify({'error': 'baslangic ve bitis ISO 8601 biçiminde ve sıralı olmalı'}), 400
+    return jsonify({
+        'baslangic': baslangic.isoformat(),
+        'bitis': bitis.isoformat(),
+        'urunler': movement_report(current_user.id, baslangic, bitis, request.args.get('barkod'))
+    })
+
+@main.route('/api/aktiviteler')
+@login_required
+@replica_reads
+def aktiviteler():
+    bitis = _tarih_parametresi('bitis', datetime.utcnow())
+    baslangic = _tarih_parametresi('baslangic', (bitis or datetime.utcnow()) - timedelta(days=30))
+    if baslangic is None or bitis is None or baslangic > bitis:
+        return jsonify({'error': 'baslangic ve bitis ISO 8601 biçiminde ve sıralı olmalı'}), 400
+    try:
+        sonra = decode_cursor(request.args.get('sonra'))
+    except ValueError:
+        return jsonify({'error': 'Geçersiz sonra parametresi'}), 400
+    adet = max(1, min(request.args.get('adet', 100, type=int), 1000))
+    
+    # Admins may read another user's log
+    user_id = current_user.id
+    if current_user.role == 'admin' and request.args.get('kullanici_id', type=int):
+        user_id = request.args.get('kullanici_id', type=int)
+    with tenant_router.scope(user_id):
+        kayitlar, sonraki = activity_history(user_id, baslangic, bitis, sonra, adet, request.args.get('islem') or None)
+    return jsonify({
+        'baslangic': baslangic.isoformat(),
+        'bitis': bitis.isoformat(),
+        'aktiviteler': kayitlar,
+        'sonra': sonraki
+    })
+
+# Inventory Analytics Routes
+@main.route('/api/envanter_analizi')
+@login_required
+@replica_reads
+@conditional_get
+def envanter_analizi():
+    started = time.perf_counter()
+    snapshot = inventory_snapshot(current_user.id)
+    analiz = snapshot.analysis(en_degerli=max(0, min(request.args.get('en_degerli', 10, type=int), 100)))
+    analiz['veri_surumu'] = snapshot.surum
+    analiz['sure_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return jsonify(analiz)
+
+@main.route('/api/stok_analizi')
+@login_required
+@replica_reads
+def stok_analizi():
+    """ABC classes, reorder points and days until stockout; most urgent products first"""
+    import numpy as np
+    teslim_suresi = request.args.get('teslim_suresi', 7, type=float)
+    hizmet_seviyesi = request.args.get('hizmet_seviyesi', 0.95, type=float)
+    if not 0 < teslim_suresi <= 365 or not 0.5 <= hizmet_seviyesi < 1:
+        return jsonify({'error': 'teslim_suresi 0-365 gün, hizmet_seviyesi 0.5-1 arasında olmalı'}), 400
+    sinif = request.args.get('sinif')
+    if sinif and sinif not in ('A', 'B', 'C'):
+        return jsonify({'error': 'sinif A, B veya C olmalı'}), 400
+    adet = max(1, min(request.args.get('adet', 100, type=int), 1000))
+    
+    started = time.perf_counter()
+    snapshot, sonuc = stock_analysis(current_user.id, teslim_suresi, hizmet_seviyesi)
+    secim = np.ones(len(snapshot), dtype=bool)
+    if sinif:
+        secim &= sonuc['sinif'] == 'ABC'.index(sinif)
+    if request.args.get('siparis') in ('1', 'true'):
+        secim &= sonuc['siparis_gerekli']
+    secilen = np.flatnonzero(secim)
+    secilen = secilen[np.lexsort((-sonuc['yillik_deger'][secilen], sonuc['kalan_gun'][secilen]))][:adet]
+    
+    ids = [int(snapshot.ids[i]) for i in secilen]
+    adlar = {urun_id: (ad, barkod) for urun_id, ad, barkod in db.session.query(Urun.id, Urun.ad, Urun.barkod)
+             .filter(Urun.user_id == current_user.id, Urun.id.in_(ids))} if ids else {}
+    urunler = []
+    for i, urun_id in zip(secilen, ids):
+        ad, barkod = adlar.get(urun_id, (None, None))
+        kalan = float(sonuc['kalan_gun'][i])
+        urunler.append({
+            'id': urun_id, 'ad': ad, 'barkod': barkod,
+            'sinif': 'ABC'[sonuc['sinif'][i]],
+            'stok_adedi': int(snapshot.stok[i]),
+            'gunluk_tuketim': round(float(sonuc['hiz'][i]), 3),
+            'guvenlik_stogu': round(float(sonuc['guvenlik_stogu'][i]), 1),
+            'siparis_noktasi': int(sonuc['siparis_noktasi'][i]),
+            'siparis_gerekli': bool(sonuc['siparis_gerekli'][i]),
+            'stok_bitis_gun': round(kalan, 1) if np.isfinite(kalan) else None,
+            'yillik_tuketim_degeri': round(float(sonuc['yillik_deger'][i]), 2)
+        })
+    
+    return jsonify({
+        'ozet': sonuc['ozet'],
+        'parametreler': {'teslim_suresi': teslim_suresi, 'hizmet_seviyesi': hizmet_seviyesi},
+        'urunler': urunler,
+        'sure_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
+
+# Stock Alert Routes
+@main.route('/api/stok_uyarilari')
+@login_required
+def stok_uyarilari():
+    durum = request.args.get('durum')
+    adet = max(1, min(request.args.get('adet', 100, type=int), 1000))
+    query = StokUyarisi.query.filter(StokUyarisi.user_id == current_user.id)
+    if durum:
+        if durum not in ('acik', 'onaylandi', 'kapandi'):
+            return jsonify({'error': 'durum acik, onaylandi veya kapandi olmalı'}), 400
+        query = query.filter(StokUyarisi.durum == durum)
+    else:
+        query = query.filter(StokUyarisi.durum != 'kapandi')
+    return jsonify({'uyarilar': [u.to_dict() for u in query.order_by(StokUyarisi.id.desc()).limit(adet)]})
+
+@main.route('/api/stok_uyari_akisi')
+@login_required
+def stok_uyari_akisi():
+    """Alert transitions after ?sonra=<event id>, oldest first; poll again with the returned cursor"""
+    sonra = request.args.get('sonra', 0, type=int)
+    adet = max(1, min(request.args.get('adet', 100, type=int), 1000))
+    # Hold back the newest events briefly: ids are assigned before commit, so a slower
+    # concurrent transaction could otherwise commit a smaller id behind the cursor
+    sinir = datetime.utcnow() - timedelta(seconds=current_app.config['STOCK_ALERT_FEED_DELAY'])
+    olaylar = StokUyariOlayi.query.filter(
+        StokUyariOlayi.user_id == current_user.id,
+        StokUyariOlayi.id > sonra,
+        StokUyariOlayi.zaman <= sinir
+    ).order_by(StokUyariOlayi.id).limit(adet).all()
+    return jsonify({
+        'olaylar': [o.to_dict() for o in olaylar],
+        'sonra': olaylar[-1].id if olaylar else sonra,
+        'devami_var': len(olaylar) == adet
+    })
+
+@main.route('/stok_uyarilari/<int:id>/onayla', methods=['POST'])
+@main.route('/api/stok_uyarilari/<int:id>/onayla', methods=['POST'])
+@login_required
+@csrf_protected
+def stok_uyarisi_onayla(id):
+    uyari = acknowledge_stock_alert(current_user.id, id)
+    if uyari is None:
+        return jsonify({'error': 'Açık uyarı bulunamadı'}), 404
+    bump_data_version(current_user.id)
+    db.session.commit()
+    return jsonify(uyari.to_dict())
+
+# Live Update Routes
+@main.route('/canli')
+@login_required
+def canli_akis():
+    """Server-Sent Events stream of the user's product, stock, alert and total changes.
+
+    The first message carries the current data version so a page rendered
+    from an older version reloads; the stream ends after
+    LIVE_UPDATES_STREAM_SECONDS and the browser reconnects.
+    """
+    if not live_updates.acquire_stream():
+        return Response('Canlı bağlantı sınırı doldu', status=503, headers={'Retry-After': '30'})
+    user_id = current_user.id
+    try:
+        # Subscribe before reading the version so no commit falls between the two
+        abonelik = live_updates.subscribe(user_id)
+        surum = data_version(user_id)[0]
+    except Exception:
+        live_updates.release_stream()
+        raise
+    sure = current_app.config['LIVE_UPDATES_STREAM_SECONDS']
+    nabiz = current_app.config['LIVE_UPDATES_HEARTBEAT_SECONDS']
+    
+    def generate():
+        try:
+            yield f"retry: 3000\ndata: {json.dumps({'olay': 'merhaba', 'veri': None, 'surum': surum})}\n\n"
+            bitis = time.monotonic() + sure
+            while time.monotonic() < bitis:
+                mesaj = abonelik.get(timeout=nabiz)
+                # Comment lines keep proxies from timing out and reveal closed connections
+                yield f'data: {mesaj}\n\n' if mesaj else ': nabiz\n\n'
+        finally:
+            abonelik.close()
+            live_updates.release_stream()
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Barcode Lookup Routes
+@main.route('/barkod_ara/<barkod>')
+@main.route('/api/barkod_ara/<barkod>')
+@login_required
+def barkod_ara(barkod):
+    urun = lookup_barcodes(current_user.id, [barkod])[barkod]
+    if urun:
+        return jsonify(urun)
+    return jsonify({'error': 'Ürün bulunamadı'}), 404
+
+@main.route('/barkod_ara', methods=['POST'])
+@main.route('/api/barkod_ara', methods=['POST'])
+@login_required
+def barkod_ara_toplu():
+    data = request.get_json(silent=True) or {}
+    barkodlar = data.get('barkodlar')
+    if not isinstance(barkodlar, list) or not all(isinstance(b, str) for b in barkodlar):
+        return jsonify({'error': 'barkodlar bir metin listesi olmalı'}), 400
+    if len(barkodlar) > 1000:
+        return jsonify({'error': 'Tek istekte en fazla 1000 barkod sorgulanabilir'}), 400
     
-    return render_template('dusuk_stok.html', products=dusuk_stok_products)
+    return jsonify({'urunler': lookup_barcodes(current_user.id, list(dict.fromkeys(barkodlar)))})
+
+# Readiness check for load balancers: one trivial query, no session or template work
+@main.route('/hazir')
+def hazir():
+    try:
+        db.session.execute(db.text('SELECT 1'))
+    except Exception:
+        current_app.logger.exception('Readiness check failed')
+        return jsonify({'durum': 'hazir_degil'}), 503
+    return jsonify({'durum': 'hazir'})
+
+# Admin Routes
+@main.route('/admin/audit_durumu')
+@login_required
+def audit_durumu():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Yetkisiz erişim'}), 403
+    return jsonify(audit_buffer.stats())
+
+@main.route('/admin/barkod_cache_durumu')
+@login_required
+def barkod_cache_durumu():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Yetkisiz erişim'}), 403
+    return jsonify(barcode_cache.stats())
+
+@main.route('/metrics')
+def metrics():
+    # Scrapers authenticate with a static bearer token; people with an admin session
+    token = current_app.config['METRICS_TOKEN']
+    authorization = request.headers.get('Authorization', '')
+    token_ok = bool(token) and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())
+    if not token_ok and not (current_user.is_authenticated and current_user.role == 'admin'):
+        return jsonify({'error': 'Yetkisiz erişim'}), 403
+    if not current_app.config['METRICS_ENABLED']:
+        return jsonify({'error': 'Metrikler devre dışı'}), 404
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
 
-# Missing Routes for compatibility
-@app.route('/pdf_rapor')
+# Report Routes
+def _rapor_json(job_id, durum):
+    return {
+        'is_id': job_id,
+        'durum': durum,
+        'durum_url': url_for('main.rapor_durumu', job_id=job_id),
+        'indirme_url': url_for('main.rapor_indir', job_id=job_id)
+    }
+
+@main.route('/pdf_rapor')
 @login_required
 def pdf_rapor():
-    # Placeholder for PDF report - will implement later
-    flash('PDF rapor özelliği yakında eklenecek!', 'info')
-    return redirect(url_for('dashboard'))
+    job_id, durum = pdf_reports.submit(current_user.id, user_data_version(current_user.id))
+    if durum == 'hazir':
+        return redirect(url_for('main.rapor_indir', job_id=job_id))
+    flash('PDF raporunuz hazırlanıyor, birkaç saniye sonra tekrar deneyin.', 'info')
+    return redirect(request.referrer or url_for('main.dashboard'))
 
-# Export Routes
-@app.route('/excel_aktar')
+@main.route('/api/raporlar/pdf', methods=['POST'])
 @login_required
-def excel_aktar():
-    # User-specific products
-    products = Urun.query.filter_by(user_id=current_user.id).all()
+@csrf_protected
+def rapor_olustur():
+    job_id, durum = pdf_reports.submit(current_user.id, user_data_version(current_user.id))
+    return jsonify(_rapor_json(job_id, durum)), 200 if durum == 'hazir' else 202
+
+@main.route('/api/raporlar/<job_id>')
+@login_required
+def rapor_durumu(job_id):
+    durum = pdf_reports.status(current_user.id, job_id)
+    return jsonify(_rapor_json(job_id, durum)), 404 if durum == 'bulunamadi' else 200
+
+@main.route('/raporlar/<job_id>/indir')
+@main.route('/api/raporlar/<job_id>/indir')
+@login_required
+def rapor_indir(job_id):
+    if pdf_reports.status(current_user.id, job_id) != 'hazir':
+        return jsonify({'error': 'Rapor hazır değil'}), 404
+    log_user_activity('export', 'pdf', None, {'is_id': job_id})
+    return send_file(
+        pdf_reports.path(current_user.id, job_id),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f'stok_raporu_{current_user.username}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+    )
+
+# Export Routes
+class _QueueWriter(io.RawIOBase):
+    """Write-only file object that hands fixed-size chunks to a bounded queue"""
     
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Stok Listesi"
+    def __init__(self, chunks, cancelled, chunk_size=64 * 1024):
+        self.chunks = chunks
+        self.cancelled = cancelled
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
     
-    # Headers
-    headers = ['ID', 'Ürün Adı', 'Barkod', 'Stok Adedi', 'Birim Fiyat (₺)', 
-               'Toplam Değer (₺)', 'Kategori', 'Stok Durumu', 'Açıklama']
-    ws.append(headers)
-    
-    # Style headers
-    for cell in ws[1]:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    
-    # Data rows
-    for product in products:
-        ws.append([
-            product.id,
-            product.ad,
-            product.barkod,
-            product.stok_adedi,
-            product.birim_fiyat,
-            product.toplam_deger,
-            product.kategori,
-            product.stok_durumu,
-            product.aciklama or ''
-        ])
+    def writable(self):
+        return True
     
-    # Auto-adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
+    def write(self, data):
+        self.buffer.extend(data)
+        if len(self.buffer) >= self.chunk_size:
+            self._put(bytes(self.buffer))
+            self.buffer.clear()
+        return len(data)
+    
+    def close(self):
+        if self.buffer:
+            self._put(bytes(self.buffer))
+            self.buffer.clear()
+        super().close()
+    
+    def _put(self, item):
+        # Back-pressure: block while the client is slower than the zip writer
+        while not self.cancelled.is_set():
             try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
+                self.chunks.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+        raise IOError('Client disconnected')
+
+def stream_workbook(wb):
+    """Save a write-only workbook on a helper thread, yielding zip bytes as they are produced.
+
+    Rows must already be appended: the download starts once every row is in the
+    sheet's temp file, this only avoids holding the finished file in memory.
+    """
+    chunks = queue.Queue(maxsize=16)
+    cancelled = threading.Event()
+    done = object()
     
-    # Save to memory
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
+    def produce():
+        try:
+            with _QueueWriter(chunks, cancelled) as writer:
+                wb.save(writer)
+        except Exception as exc:
+            if not cancelled.is_set():
+                chunks.put(exc)
+            return
+        chunks.put(done)
     
-    log_user_activity('export', 'excel', None, {'product_count': len(products)})
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+
+def _excel_column_widths(user_id, headers):
+    """Column widths from a single MAX(LENGTH()) aggregate.
+
+    Write-only sheets emit <cols> before the first row, so widths have to be
+    known before streaming starts.
+    """
+    uzunluk = lambda col: db.func.max(db.func.length(col))
+    widths = db.session.query(
+        db.func.max(Urun.id),
+        uzunluk(Urun.ad),
+        uzunluk(Urun.barkod),
+        db.func.max(Urun.stok_adedi),
+        db.func.max(Urun.birim_fiyat),
+        db.func.max(Urun.stok_adedi * Urun.birim_fiyat),
+        uzunluk(Urun.kategori),
+        db.func.max(db.func.length(Urun.stok_durumu)),
+        uzunluk(Urun.aciklama)
+    ).filter(Urun.user_id == user_id).one()
     
-    return send_file(
-        output,
+    numeric = {0, 3, 4, 5}
+    result = []
+    for i, (header, value) in enumerate(zip(headers, widths)):
+        length = len(str(value)) if i in numeric and value is not None else (value or 0)
+        result.append(min(max(length, len(header)) + 2, 50))
+    return result
+
+@main.route('/excel_aktar')
+@login_required
+@replica_reads
+@conditional_get
+def excel_aktar():
+    user_id = current_user.id
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    
+    headers = ['ID', 'Ürün Adı', 'Barkod', 'Stok Adedi', 'Birim Fiyat (₺)', 
+               'Toplam Değer (₺)', 'Kategori', 'Stok Durumu', 'Açıklama']
+    widths = _excel_column_widths(user_id, headers)
+    
+    def generate():
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, PatternFill
+        
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Stok Listesi")
+        
+        # Column widths must be set before the first row is written
+        for i, width in enumerate(widths):
+            ws.column_dimensions[chr(ord('A') + i)].width = width
+        
+        # Styled header row
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = Font(bold=True)
+            cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+            header_cells.append(cell)
+        ws.append(header_cells)
+        
+        # Data rows, fetched in batches as plain tuples. The write-only sheet spools them to a
+        # temp file and the zip is only assembled by save(), so memory stays flat but the
+        # first byte goes out after the last row is written
+        rows = db.session.query(
+            Urun.id,
+            Urun.ad,
+            Urun.barkod,
+            Urun.stok_adedi,
+            Urun.birim_fiyat,
+            Urun.stok_adedi * Urun.birim_fiyat,
+            Urun.kategori,
+            Urun.stok_durumu,
+            Urun.aciklama
+        ).filter(Urun.user_id == user_id).order_by(Urun.id).yield_per(batch_size)
+        
+        product_count = 0
+        for row in rows:
+            ws.append(list(row[:-1]) + [row[-1] or ''])
+            product_count += 1
+        
+        log_user_activity('export', 'excel', None, {'product_count': product_count})
+        
+        yield from stream_workbook(wb)
+    
+    filename = f'stok_listesi_{current_user.username}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+    return Response(
+        stream_with_context(generate()),
         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name=f'stok_listesi_{current_user.username}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
     )
 
+@main.cli.command('import-products')
+@click.argument('username')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_products_command(username, path):
+    """Import products for USERNAME from a CSV or XLSX file"""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f'Kullanıcı bulunamadı: {username}')
+    
+    def progress(report):
+        click.echo(f"{report['toplam']} satır işlendi "
+                   f"({report['eklenen']} eklendi, {report['guncellenen']} güncellendi, {report['hatali']} hatalı)")
+    
+    with open(path, 'rb') as stream, tenant_router.scope(user.id):
+        report = import_products(user.id, iter_import_rows(stream, path), progress=progress)
+    
+    for hata in report['hatalar']:
+        click.echo(f"Satır {hata['satir']}: {hata['hatalar']}", err=True)
+    click.echo(f"Tamamlandı: {report['toplam']} satır, {report['sure']} sn, {report['satir_per_saniye']} satır/sn")
+
 # Initialize database - Flask 2.3+ compatible
-def create_tables():
+def create_tables(app):
     with app.app_context():
         db.create_all()
 
+_schema_lock = threading.Lock()
+
+# Indexes added to tables that deployed databases already have: create_all only builds
+# indexes together with a new table, so ensure_schema adds these when they are missing
+_LATE_INDEXES = ('ix_products_user_stok', 'ix_products_user_stok_farki',
+                 'ix_products_user_olusturma', 'ix_products_user_guncelleme')
+
+def _create_late_indexes(engine):
+    # IF NOT EXISTS rather than checkfirst: reflection can't see expression indexes
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name in _LATE_INDEXES:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+
+def ensure_schema(app):
+    """Create missing tables on first use instead of at import (runs from before_request).
+
+    Checked once per process; for server databases a marker file keyed by the
+    database URL and table layout also skips the check on later cold starts.
+    SQLite is always checked, since the file may have been replaced.
+    """
+    if app.extensions.get('schema_ready'):
+        return
+    with _schema_lock:
+        if app.extensions.get('schema_ready'):
+            return
+        started = time.perf_counter()
+        uris = [app.config['SQLALCHEMY_DATABASE_URI'], *app.config['TENANT_DATABASES'].values()]
+        layout = ';'.join(f"{t.name}({','.join(c.name for c in t.columns)})" for t in db.metadata.sorted_tables)
+        layout += '|' + ','.join(_LATE_INDEXES)
+        marker = None
+        if not any(uri.startswith('sqlite') for uri in uris):
+            fingerprint = hashlib.sha1(f"{'|'.join(uris)}|{layout}".encode()).hexdigest()[:16]
+            marker = os.path.join(app.config['SCHEMA_MARKER_DIR'], f'stok-schema-{fingerprint}')
+        
+        if marker is None or not os.path.exists(marker):
+            with app.app_context():
+                db.create_all(bind_key=None)
+                # Tenant stores carry the full schema (users only as foreign key anchors)
+                for magaza in tenant_router.stores:
+                    db.metadata.create_all(tenant_router.engine(magaza))
+                for magaza in tenant_router.all_stores():
+                    _create_late_indexes(tenant_router.engine(magaza))
+                    with tenant_router.engine(magaza).begin() as conn:
+                        seed_opening_snapshots(conn)
+            if marker:
+                try:
+                    open(marker, 'w').close()
+                except OSError:
+                    app.logger.warning('Schema marker %s could not be written', marker)
+        
+        app.extensions['schema_ready'] = True
+        request_metrics.set_gauge('app_startup_seconds', (('phase', 'schema_check'),),
+                                  time.perf_counter() - started)
+
+@main.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Backfill the per-category stats table for every user"""
+    db.create_all()
+    for (user_id,) in db.session.query(User.id).all():
+        with tenant_router.scope(user_id):
+            rebuild_category_stats(user_id)
+    click.echo('Kategori istatistikleri yeniden oluşturuldu.')
+
+@main.cli.command('rebuild-stock-alerts')
+def rebuild_stock_alerts_command():
+    """Raise or clear stock alerts for every user from current stock (backfill)"""
+    db.create_all()
+    for (user_id,) in db.session.query(User.id).all():
+        with tenant_router.scope(user_id):
+            rebuild_stock_alerts(user_id)
+    click.echo('Stok uyarıları yeniden değerlendirildi.')
+
+@main.cli.command('snapshot-stock')
+def snapshot_stock_command():
+    """Record current stock of every product (run periodically, e.g. nightly)"""
+    db.create_all()
+    count = 0
+    for magaza in tenant_router.all_stores():
+        with tenant_router.scope(magaza=magaza):
+            count += take_stock_snapshot()
+    click.echo(f'{count} ürün için stok anlık görüntüsü alındı.')
+
+@main.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Build search documents for every product"""
+    db.create_all()
+    count = 0
+    for magaza in tenant_router.all_stores():
+        last_id = 0
+        with tenant_router.scope(magaza=magaza):
+            while True:
+                batch = Urun.query.options(db.joinedload(Urun.arama))\
+                    .filter(Urun.id > last_id).order_by(Urun.id).limit(1000).all()
+                if not batch:
+                    break
+                for product in batch:
+                    update_search_index(product)
+                db.session.commit()
+                count += len(batch)
+                last_id = batch[-1].id
+    click.echo(f'{count} ürün için arama dizini oluşturuldu.')
+
+@main.cli.command('archive-activities')
+@click.option('--gun', type=int, default=None, help='Days kept in the live table (default: AUDIT_RETENTION_DAYS)')
+def archive_activities_command(gun):
+    """Move old activities into compressed monthly archive files"""
+    if not current_app.config['AUDIT_ARCHIVE_DIR']:
+        raise click.ClickException('AUDIT_ARCHIVE_DIR tanımlı değil; arşivler için kalıcı bir dizin verin')
+    db.create_all()
+    gun = current_app.config['AUDIT_RETENTION_DAYS'] if gun is None else gun
+    kesim = datetime.utcnow() - timedelta(days=gun)
+    for magaza in tenant_router.all_stores():
+        click.echo(f'{magaza or "ana"}: {archive_activities(kesim, magaza)} aktivite arşivlendi ({kesim:%Y-%m-%d} öncesi).')
+
+@main.cli.command('move-tenant')
+@click.argument('magaza')
+@click.argument('usernames', nargs=-1, required=True)
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows per insert batch')
+def move_tenant_command(magaza, usernames, chunk_size):
+    """Move USERNAMES' rows to store MAGAZA (a TENANT_DATABASES name, or "ana" for the primary)"""
+    magaza = None if magaza == 'ana' else magaza
+    if magaza is not None and magaza not in tenant_router.stores:
+        raise click.ClickException(f'Tanımsız veritabanı: {magaza} (TENANT_DATABASES)')
+    users = [(username, User.query.filter_by(username=username).first()) for username in usernames]
+    for username, user in users:
+        if user is None:
+            raise click.ClickException(f'Kullanıcı bulunamadı: {username}')
+    db.create_all()
+    for username, user in users:
+        click.echo(f'{username}: {tenant_router.placement(user.id, cached=False)[0] or "ana"} -> {magaza or "ana"}')
+        try:
+            sayilar = move_tenant(user.id, magaza, chunk_size=chunk_size, log=click.echo)
+        except db.exc.IntegrityError as exc:
+            raise click.ClickException(f'{username} taşınamadı, id çakışması (kullanıcı yerinde kaldı): {exc.orig}')
+        click.echo(f"{username} taşındı: {sum(sayilar.values())} satır")
+
+# Application Factory
+def create_app(config=None):
+    """Build and configure the application; config overrides environment settings"""
+    started = time.perf_counter()
+    app = Flask(__name__)
+    configure_app(app)
+    if config:
+        app.config.update(config)
+    
+    tenant_router.init_app(app)  # adds the store binds, so before db.init_app
+    db.init_app(app)
+    bcrypt.init_app(app)
+    login_manager.init_app(app)
+    audit_buffer.init_app(app)
+    request_metrics.init_app(app)
+    pdf_reports.init_app(app)
+    live_updates.init_app(app)
+    password_hasher.init_app(app)
+    barcode_cache.configure(app.config['BARCODE_CACHE_SIZE'], app.config['BARCODE_CACHE_TTL'])
+    api_user_cache.configure(10000, app.config['API_USER_CACHE_TTL'])
+    product_count_cache.configure(10000, app.config['PRODUCT_COUNT_CACHE_TTL'])
+    inventory_snapshot_cache.configure(app.config['INVENTORY_SNAPSHOT_CACHE_SIZE'])
+    stock_analysis_cache.configure(app.config['STOCK_ANALYSIS_CACHE_SIZE'])
+    
+    app.register_blueprint(main)
+    # Token for scripts posting to csrf_protected routes (see the csrf-token meta tag)
+    app.jinja_env.globals['csrf_token'] = generate_csrf
+    
+    @app.before_request
+    def _ensure_schema():
+        ensure_schema(app)
+    
+    request_metrics.set_gauge('app_startup_seconds', (('phase', 'import'),), _IMPORT_SECONDS)
+    request_metrics.set_gauge('app_startup_seconds', (('phase', 'create_app'),), time.perf_counter() - started)
+    app.logger.info('Startup: import %.0f ms, create_app %.0f ms',
+                    _IMPORT_SECONDS * 1000, (time.perf_counter() - started) * 1000)
+    return app
+
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
+    app = create_app()
+    create_tables(app)
     
     # Production için port ayarı
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,369 @@
+"""Latency / throughput benchmarks for the main read routes.
+
+Builds a synthetic SQLite database (N users x M products x K activities,
+seeded, so runs are reproducible), then drives the app through its routes:
+
+  * testclient - Flask test client, one request at a time, in process
+  * server     - local threaded WSGI server hit by C concurrent HTTP clients
+
+For every route it reports p50/p95/p99/mean latency (ms), throughput
+(req/s), SQL statements per request and peak Python memory per request
+(tracemalloc, test client pass only), and writes everything to a JSON file.
+
+    python benchmarks/run_benchmarks.py --users 5 --products 20000 --activities 5000
+    python benchmarks/run_benchmarks.py --output new.json --compare old.json
+
+The generated database is kept with --db PATH and reused when it exists,
+which keeps repeated runs comparable and skips the generation step.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app as appmod  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+PASSWORD = 'benchmark1'
+CATEGORIES = ['Genel', 'Gıda', 'İçecek', 'Temizlik', 'Kırtasiye', 'Elektronik', 'Giyim', 'Spor']
+WORDS = ['Çay', 'Şeker', 'Un', 'Deterjan', 'Kalem', 'Defter', 'Kablo', 'Pil', 'Tişört', 'Top',
+         'Süt', 'Peynir', 'Sabun', 'Şampuan', 'Makas', 'Silgi', 'Priz', 'Lamba', 'Çorap', 'Forma']
+ACTIONS = ['create', 'update', 'delete', 'login', 'export', 'stock_movement']
+
+
+# Synthetic data
+def generate_data(app, users, products, activities, seed):
+    """Fill an empty database; products and activities are per user"""
+    rnd = random.Random(seed)
+    db = appmod.db
+    now = datetime.utcnow()
+
+    with app.app_context():
+        db.create_all()
+        template = appmod.User()
+        template.set_password(PASSWORD)
+
+        for u in range(users):
+            user = appmod.User(username=f'bench{u}', email=f'bench{u}@example.com',
+                               password_hash=template.password_hash, first_name='Bench', last_name=str(u))
+            db.session.add(user)
+            db.session.flush()
+
+            for start in range(0, products, 5000):
+                rows = []
+                for i in range(start, min(start + 5000, products)):
+                    created = now - timedelta(minutes=rnd.randint(0, 60 * 24 * 365))
+                    rows.append({
+                        'ad': f'{rnd.choice(WORDS)} {rnd.choice(WORDS)} {i}',
+                        'barkod': f'{u:03d}{i:010d}',
+                        'stok_adedi': rnd.choice([0, rnd.randint(1, 15), rnd.randint(16, 1200)]),
+                        'birim_fiyat': round(rnd.uniform(0.5, 500), 2),
+                        'kategori': rnd.choice(CATEGORIES),
+                        'aciklama': f'{rnd.choice(WORDS)} açıklama' if rnd.random() < 0.3 else None,
+                        'min_stok_seviyesi': rnd.randint(5, 20),
+                        'max_stok_seviyesi': rnd.randint(500, 1000),
+                        'user_id': user.id,
+                        'olusturma_tarihi': created,
+                        'guncelleme_tarihi': created + timedelta(minutes=rnd.randint(0, 60 * 24 * 30)),
+                    })
+                db.session.execute(db.insert(appmod.Urun), rows)
+
+            # Search documents for every product
+            docs = [
+                {'product_id': pid, 'user_id': user.id, 'icerik': appmod.search_document(ad, barkod, kategori, aciklama)}
+                for pid, ad, barkod, kategori, aciklama in db.session.query(
+                    appmod.Urun.id, appmod.Urun.ad, appmod.Urun.barkod, appmod.Urun.kategori, appmod.Urun.aciklama
+                ).filter(appmod.Urun.user_id == user.id)
+            ]
+            for start in range(0, len(docs), 5000):
+                db.session.execute(db.insert(appmod.UrunArama), docs[start:start + 5000])
+
+            for start in range(0, activities, 5000):
+                db.session.execute(db.insert(appmod.UserActivity), [{
+                    'user_id': user.id,
+                    'action': rnd.choice(ACTIONS),
+                    'resource_type': 'product',
+                    'resource_id': rnd.randint(1, max(products, 1)),
+                    'details': {'barcode': f'{u:03d}{rnd.randint(0, max(products - 1, 0)):010d}'},
+                    'ip_address': '127.0.0.1',
+                    'user_agent': 'benchmark',
+                    'timestamp': now - timedelta(minutes=rnd.randint(0, 60 * 24 * 365)),
+                } for _ in range(start, min(start + 5000, activities))])
+
+            db.session.commit()
+            appmod.rebuild_category_stats(user.id)
+            # Rows were inserted directly, so raise the low-stock alerts the write path would have
+            appmod.rebuild_stock_alerts(user.id)
+            low_stock = appmod.Urun.query.filter(
+                appmod.Urun.user_id == user.id, appmod.Urun.stok_durumu_filtresi('kritik', 'dusuk')).count()
+            alerts = appmod.StokUyarisi.query.filter_by(user_id=user.id, durum='acik').count()
+            assert alerts == low_stock, f'bench{u}: {alerts} open alerts for {low_stock} low-stock products'
+
+
+def route_paths(app, username):
+    """Routes to measure, including a deep urun_listesi page reached by cursor"""
+    with app.app_context():
+        user = appmod.User.query.filter_by(username=username).one()
+        query = appmod.Urun.query.filter_by(user_id=user.id)\
+            .order_by(appmod.Urun.guncelleme_tarihi.desc(), appmod.Urun.id.desc())
+        middle = query.offset(query.count() // 2).first()
+        word = appmod.Urun.query.filter_by(user_id=user.id).first().ad.split()[0] if middle else 'x'
+
+    paths = {
+        'dashboard': '/dashboard',
+        'urun_listesi': '/urun_listesi',
+        'urun_listesi_derin': '/urun_listesi' + (f'?sonraki={appmod.encode_cursor(middle)}' if middle else ''),
+        'api_urun_listesi': '/api/urun_listesi',
+        'dusuk_stok': '/dusuk_stok',
+        'ara': '/ara?' + urllib.parse.urlencode({'q': word}),
+        'ara_barkod': '/ara?q=' + (middle.barkod if middle else 'x'),
+        'excel_aktar': '/excel_aktar',
+        'envanter_analizi': '/api/envanter_analizi',
+    }
+    return paths
+
+
+# Measurement helpers
+class SQLCounter:
+    """Counts statements executed on the engine (all threads)"""
+
+    def __init__(self, engine):
+        self.count = 0
+        self.lock = threading.Lock()
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        with self.lock:
+            self.count += 1
+
+    def reset(self):
+        with self.lock:
+            count, self.count = self.count, 0
+        return count
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(latencies, elapsed, statements, errors):
+    ms = [x * 1000 for x in latencies]
+    return {
+        'requests': len(ms),
+        'errors': errors,
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+        'mean_ms': round(sum(ms) / len(ms), 3),
+        'throughput_rps': round(len(ms) / elapsed, 2),
+        'sql_per_request': round(statements / len(ms), 2),
+    }
+
+
+# Runners
+def run_testclient(app, paths, requests, warmup, username):
+    client = app.test_client()
+    client.post('/login', data={'username': username, 'password': PASSWORD})
+    client.get('/dashboard')  # consume the login flash message
+    counter = SQLCounter(_engine(app))
+    results = {}
+
+    for name, path in paths.items():
+        for _ in range(warmup):
+            client.get(path).get_data()
+
+        counter.reset()
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            response = client.get(path)
+            response.get_data()
+            latencies.append(time.perf_counter() - t0)
+            errors += response.status_code != 200
+        results[name] = summarize(latencies, time.perf_counter() - started, counter.reset(), errors)
+
+        # Separate pass so tracing overhead doesn't skew the latency numbers
+        tracemalloc.start()
+        client.get(path).get_data()
+        results[name]['peak_mem_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        tracemalloc.stop()
+    return results
+
+
+def run_server(app, paths, requests, warmup, concurrency, usernames):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    base = f'http://127.0.0.1:{server.server_port}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # One logged-in cookie jar per concurrent client, spread across users
+    openers = []
+    for i in range(concurrency):
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        data = urllib.parse.urlencode({'username': usernames[i % len(usernames)], 'password': PASSWORD}).encode()
+        opener.open(base + '/login', data).read()
+        openers.append(opener)
+
+    def fetch(opener, path):
+        t0 = time.perf_counter()
+        try:
+            with opener.open(base + path) as response:
+                response.read()
+                ok = response.status == 200
+        except Exception:
+            ok = False
+        return time.perf_counter() - t0, ok
+
+    counter = SQLCounter(_engine(app))
+    results = {}
+    try:
+        with ThreadPoolExecutor(concurrency) as pool:
+            for name, path in paths.items():
+                list(pool.map(lambda i: fetch(openers[i % concurrency], path), range(warmup * concurrency)))
+                counter.reset()
+                started = time.perf_counter()
+                outcomes = list(pool.map(lambda i: fetch(openers[i % concurrency], path), range(requests)))
+                elapsed = time.perf_counter() - started
+                results[name] = summarize([t for t, _ in outcomes], elapsed, counter.reset(),
+                                          sum(not ok for _, ok in outcomes))
+                results[name]['concurrency'] = concurrency
+    finally:
+        server.shutdown()
+    return results
+
+
+def _engine(app):
+    with app.app_context():
+        return appmod.db.engine
+
+
+# Reporting
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f'\nComparison with {baseline_path} (p95 ms / req/s / SQL per request)')
+    for mode, routes in current['results'].items():
+        for name, stats in routes.items():
+            old = baseline.get('results', {}).get(mode, {}).get(name)
+            if not old:
+                continue
+            change = (stats['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0.0
+            print(f"  {mode:<10} {name:<20} p95 {old['p95_ms']:>9.2f} -> {stats['p95_ms']:>9.2f} ({change:+6.1f}%)"
+                  f"  rps {old['throughput_rps']:>8.1f} -> {stats['throughput_rps']:>8.1f}"
+                  f"  sql {old['sql_per_request']:>5} -> {stats['sql_per_request']:>5}")
+
+
+def print_table(results):
+    for mode, routes in results.items():
+        print(f'\n[{mode}]')
+        print(f"  {'route':<20} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>9} {'sql':>6} {'peak KB':>9} {'err':>4}")
+        for name, s in routes.items():
+            print(f"  {name:<20} {s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} {s['p99_ms']:>9.2f} "
+                  f"{s['throughput_rps']:>9.1f} {s['sql_per_request']:>6} {s.get('peak_mem_kb', '-'):>9} {s['errors']:>4}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--products', type=int, default=5000, help='products per user')
+    parser.add_argument('--activities', type=int, default=2000, help='activity log rows per user')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=100, help='measured requests per route')
+    parser.add_argument('--warmup', type=int, default=5, help='unmeasured requests per route (per client)')
+    parser.add_argument('--concurrency', type=int, default=8, help='parallel clients in server mode')
+    parser.add_argument('--mode', choices=['testclient', 'server', 'both'], default='both')
+    parser.add_argument('--routes', help='comma separated subset of route names')
+    parser.add_argument('--db', help='SQLite file to create or reuse (default: temporary)')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='previous results JSON to compare against')
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='stok_bench_'), 'bench.db')
+    reuse = os.path.exists(db_path)
+    app = appmod.create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(db_path)}',
+        'WTF_CSRF_ENABLED': False,
+    })
+
+    if not reuse:
+        t0 = time.perf_counter()
+        generate_data(app, args.users, args.products, args.activities, args.seed)
+        print(f'Generated {args.users} users x {args.products} products x {args.activities} activities '
+              f'in {time.perf_counter() - t0:.1f}s -> {db_path}')
+    else:
+        print(f'Reusing {db_path}')
+
+    with app.app_context():
+        usernames = [u.username for u in appmod.User.query.filter(appmod.User.username.like('bench%'))
+                     .order_by(appmod.User.id)]
+    paths = route_paths(app, usernames[0])
+    if args.routes:
+        wanted = args.routes.split(',')
+        paths = {name: path for name, path in paths.items() if name in wanted}
+
+    results = {}
+    if args.mode in ('testclient', 'both'):
+        results['testclient'] = run_testclient(app, paths, args.requests, args.warmup, usernames[0])
+    if args.mode in ('server', 'both'):
+        results['server'] = run_server(app, paths, args.requests, args.warmup, args.concurrency, usernames)
+
+    output = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'args': vars(args),
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        'paths': paths,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2, ensure_ascii=False)
+
+    print_table(results)
+    print(f'\nResults written to {args.output}')
+    if args.compare:
+        compare(output, args.compare)
+
+
+if __name__ == '__main__':
+    main()
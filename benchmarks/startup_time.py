@@ -0,0 +1,91 @@
+"""Cold start timing: import, create_app() and the first requests in fresh processes.
+
+Each run starts a new interpreter against a new SQLite file, so the first
+request includes the lazy schema check. Reports the median and max per
+phase over --runs and lists which heavy libraries were loaded at import.
+
+    python benchmarks/startup_time.py --runs 10 --output startup.json
+    python benchmarks/startup_time.py --compare startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['openpyxl', 'reportlab', 'jwt', 'sqlalchemy.dialects.postgresql']
+
+CHILD = r'''
+import json, sys, time
+started = time.perf_counter()
+import app as appmod
+imported = time.perf_counter()
+loaded = [m for m in %(heavy)r if m in sys.modules]
+app = appmod.create_app({'SQLALCHEMY_DATABASE_URI': %(uri)r})
+created = time.perf_counter()
+client = app.test_client()
+client.get('/hazir')
+first = time.perf_counter()
+client.get('/hazir')
+second = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (first - created) * 1000,
+    'second_request_ms': (second - first) * 1000,
+    'total_ms': (first - started) * 1000,
+    'heavy_modules_at_import': loaded,
+}))
+'''
+
+
+def run_once():
+    workdir = tempfile.mkdtemp(prefix='stok_startup_')
+    code = CHILD % {'heavy': HEAVY_MODULES, 'uri': f"sqlite:///{os.path.join(workdir, 'startup.db')}"}
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', default='startup_results.json')
+    parser.add_argument('--compare', help='previous results JSON to compare against')
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    phases = ['import_ms', 'create_app_ms', 'first_request_ms', 'second_request_ms', 'total_ms']
+    summary = {
+        phase: {
+            'median': round(statistics.median(r[phase] for r in runs), 1),
+            'max': round(max(r[phase] for r in runs), 1),
+        } for phase in phases
+    }
+    output = {
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'heavy_modules_at_import': runs[0]['heavy_modules_at_import'],
+        'phases': summary,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['phases']
+    for phase in phases:
+        line = f"  {phase:<18} median {summary[phase]['median']:>8.1f} ms   max {summary[phase]['max']:>8.1f} ms"
+        if baseline and phase in baseline:
+            line += f"   (was {baseline[phase]['median']:.1f} ms)"
+        print(line)
+    print(f"  heavy modules loaded at import: {', '.join(output['heavy_modules_at_import']) or 'none'}")
+    print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
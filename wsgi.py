@@ -0,0 +1,5 @@
+"""Production WSGI entry point (gunicorn -c gunicorn.conf.py wsgi:app)"""
+from app import create_app
+
+# Tables are checked lazily on the first request (ensure_schema), not at import
+app = create_app()